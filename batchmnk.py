@@ -0,0 +1,258 @@
+from mnk import MNK, actionTable
+from typing import List, Any, Optional, Tuple
+import numpy as np
+
+'''
+A batch of MNK games stepped together with NumPy.
+All B boards live in one (B, m, n) int8 array: 0 is an empty cell and
+playerIdx+1 is a sign of self.playerSigns[playerIdx] (the same codes as MNK.getCellsView()).
+Moves are flat cell indices (i*n+j), one per game. Games that are already over
+ignore their move, so a whole batch can be played out with one call per ply.
+'''
+class BatchMNK:
+  def __init__(self, batchSize:int, m:int, n:int, k:int, playerSigns:List, emptySign:Any="-") -> None:
+    '''
+    batchSize: number of games B
+    m, n, k, playerSigns, emptySign: as in MNK. Every game of the batch shares them.
+    '''
+    if k > min(m, n):
+      raise Exception("k has to be smaller or equal to min (m, n)")
+    if emptySign in playerSigns:
+      raise Exception("Use different signs for players and default empty cell")
+    self.batchSize = batchSize
+    self.m = m
+    self.n = n
+    self.k = k
+    self.playerSigns = playerSigns[:]
+    self.emptySign = emptySign
+    self.numPlayers = len(playerSigns)
+    self.boards = np.zeros((batchSize, m, n), dtype=np.int8)
+    # Index (into self.playerSigns) of the player to move in each game
+    self.currentPlayer = np.zeros(batchSize, dtype=np.int8)
+    self.remainingMoves = np.full(batchSize, m*n, dtype=np.int32)
+    # Flat index of the last move of each game, -1 if no move was taken yet
+    self.lastMoves = np.full(batchSize, -1, dtype=np.int32)
+    # Index of the winner of each game, -1 if there is none (yet)
+    self.winners = np.full(batchSize, -1, dtype=np.int8)
+    self.terminal = np.zeros(batchSize, dtype=bool)
+
+  @classmethod
+  def fromStates(cls, states:List[MNK])->'BatchMNK':
+    '''
+    Builds a batch from MNK states. All states must share m, n, k and playerSigns.
+    '''
+    first = states[0]
+    batch = cls(len(states), first.m, first.n, first.k, first.playerSigns, first.emptySign)
+    for b, state in enumerate(states):
+      if (state.m, state.n, state.k, state.playerSigns) != (first.m, first.n, first.k, first.playerSigns):
+        raise Exception("All states of a batch must have the same m, n, k and playerSigns.")
+      batch.boards[b] = np.frombuffer(state.getCellsView(), dtype=np.uint8).reshape(state.m, state.n)
+      batch.currentPlayer[b] = state.playerIndex[state.getCurrentPlayerSign()]
+      batch.remainingMoves[b] = state.remainingMoves
+      if state.lastAction:
+        batch.lastMoves[b] = state.lastAction.m*state.n+state.lastAction.n
+      if state.isTerminal():
+        batch.terminal[b] = True
+        if 1 in state.utility: batch.winners[b] = state.utility.index(1)
+    return batch
+
+  def repeat(self, times:int)->'BatchMNK':
+    '''
+    Returns a new batch with every game of this batch repeated `times` times in a row.
+    '''
+    batch = self.__class__(self.batchSize*times, self.m, self.n, self.k, self.playerSigns, self.emptySign)
+    for name in ("boards", "currentPlayer", "remainingMoves", "lastMoves", "winners", "terminal"):
+      setattr(batch, name, np.repeat(getattr(self, name), times, axis=0))
+    return batch
+
+  def toStates(self)->List[MNK]:
+    '''
+    Returns one MNK state per game of the batch.
+    '''
+    states = []
+    for b in range(self.batchSize):
+      state = MNK(self.m, self.n, self.k, self.playerSigns, self.emptySign)
+      board = self.boards[b].ravel()
+      for index in np.flatnonzero(board):
+        state._placeSign(actionTable(self.m, self.n, self.playerSigns[board[index]-1])[index])
+      current = int(self.currentPlayer[b])
+      state.playerSignsRotation = self.playerSigns[current:] + self.playerSigns[:current]
+      state.remainingMoves = int(self.remainingMoves[b])
+      lastMove = int(self.lastMoves[b])
+      if lastMove>=0:
+        state.lastAction = actionTable(self.m, self.n, self.playerSigns[board[lastMove]-1])[lastMove]
+      if self.terminal[b]:
+        state._isTerminal = True
+        if self.winners[b]>=0: state._encodeUtility()
+      states.append(state)
+    return states
+
+  def legalMask(self)->np.ndarray:
+    '''
+    Returns a (B, m*n) boolean array of the empty cells. Rows of finished games are all False.
+    '''
+    mask = self.boards.reshape(self.batchSize, -1)==0
+    mask[self.terminal] = False
+    return mask
+
+  def isTerminal(self)->np.ndarray:
+    '''
+    Returns a (B,) boolean array of finished games
+    '''
+    return self.terminal.copy()
+
+  def getUtilities(self)->np.ndarray:
+    '''
+    Returns a (B, numPlayers) int8 array of utilities, encoded as in MNK:
+    1 for the winner and -1 for the others, or all 0 for a draw or an unfinished game.
+    '''
+    utilities = np.zeros((self.batchSize, self.numPlayers), dtype=np.int8)
+    won = self.winners>=0
+    utilities[won] = -1
+    utilities[np.flatnonzero(won), self.winners[won]] = 1
+    return utilities
+
+  def applyActions(self, moves:np.ndarray)->None:
+    '''
+    Takes one move per game, in place.
+    moves: (B,) flat cell indices (i*n+j). The moves of finished games are ignored.
+    After the moves, the players are rotated, and terminal status and winners are updated.
+    '''
+    moves = np.asarray(moves)
+    active = np.flatnonzero(~self.terminal)
+    if active.size==0: return
+    moves = moves[active]
+    rows, cols = moves//self.n, moves%self.n
+    if ((moves<0) | (moves>=self.m*self.n)).any() or (self.boards[active, rows, cols]!=0).any():
+      raise Exception("Illegal Action.")
+    codes = (self.currentPlayer[active]+1).astype(np.int8)
+    self.boards[active, rows, cols] = codes
+    self.lastMoves[active] = moves
+    self.remainingMoves[active] -= 1
+    self.currentPlayer[active] = (self.currentPlayer[active]+1)%self.numPlayers
+
+    won = self._connectsK(active, rows, cols, codes)
+    self.winners[active[won]] = codes[won]-1
+    self.terminal[active[won | (self.remainingMoves[active]<=0)]] = True
+
+  def _connectsK(self, games:np.ndarray, rows:np.ndarray, cols:np.ndarray, codes:np.ndarray)->np.ndarray:
+    '''
+    Whether the signs just placed at (rows, cols) of `games` connect self.k signs in a row, col, or diagonally.
+    As MNK.checkWinner, only the lines through the placed sign are checked.
+    '''
+    won = np.zeros(games.size, dtype=bool)
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+      count = np.ones(games.size, dtype=np.int32)
+      for sign in (1, -1):
+        running = np.ones(games.size, dtype=bool)
+        for step in range(1, self.k):
+          r, c = rows+sign*step*dr, cols+sign*step*dc
+          inside = (r>=0) & (r<self.m) & (c>=0) & (c<self.n)
+          running &= inside
+          running[running] &= self.boards[games[running], r[running], c[running]]==codes[running]
+          count += running
+          if not running.any(): break
+      won |= count>=self.k
+    return won
+
+  def sampleRandomActions(self, rng:Optional[np.random.Generator]=None)->np.ndarray:
+    '''
+    Returns (B,) uniformly random legal moves, one per game. Finished games get -1.
+    '''
+    rng = rng if rng is not None else np.random.default_rng()
+    mask = self.legalMask()
+    scores = np.where(mask, rng.random(mask.shape), -1.0)
+    moves = scores.argmax(axis=1)
+    moves[self.terminal] = -1
+    return moves
+
+  def randomPlayout(self, rng:Optional[np.random.Generator]=None)->np.ndarray:
+    '''
+    Plays every game to the end with uniformly random moves, in place.
+    Returns the (B, numPlayers) utilities.
+    '''
+    rng = rng if rng is not None else np.random.default_rng()
+    # Picking a uniformly random empty cell at every ply is the same as walking the empty
+    # cells in a random order, so the order is drawn once: empty cells get a random key in
+    # [0, 1) and occupied cells -1, and each game takes its cells in decreasing key order.
+    mask = self.legalMask()
+    order = np.argsort(-np.where(mask, rng.random(mask.shape), -1.0), axis=1)
+    for ply in range(int(mask.sum(axis=1).max(initial=0))):
+      if self.terminal.all(): break
+      self.applyActions(order[:, ply])
+    return self.getUtilities()
+
+  def __str__(self)->str:
+    signs = np.array([self.emptySign]+self.playerSigns, dtype=object)
+    return '\n\n'.join('\n'.join(' '.join(map(str, row)) for row in signs[board]) for board in self.boards)
+
+def connectedK(boards:np.ndarray, k:int, numPlayers:Optional[int]=None, chunkSize:int=16384)->np.ndarray:
+  '''
+  Whether each player has k signs in a row, col, or diagonally, anywhere on each board.
+  Unlike MNK.checkWinner, it does not rely on the last move, so it can check
+  imported positions and generated datasets.
+  boards: (B, m, n) or (m, n) array of player codes (0 empty, playerIdx+1 otherwise)
+  numPlayers: number of players. Defaults to the largest code found on the boards.
+  chunkSize: number of boards processed at once, to bound the memory used.
+  Returns a (B, numPlayers) boolean array, or (numPlayers,) for a single board.
+  '''
+  boards = np.asarray(boards)
+  single = boards.ndim==2
+  if single: boards = boards[np.newaxis]
+  if numPlayers is None: numPlayers = int(boards.max(initial=0))
+  result = np.zeros((boards.shape[0], numPlayers), dtype=bool)
+  for start in range(0, boards.shape[0], chunkSize):
+    chunk = boards[start:start+chunkSize]
+    for playerIdx in range(numPlayers):
+      result[start:start+chunkSize, playerIdx] = _hasKInARow(chunk==playerIdx+1, k)
+  return result[0] if single else result
+
+def _hasKInARow(signs:np.ndarray, k:int)->np.ndarray:
+  '''
+  signs: (B, m, n) boolean array of one player's signs.
+  Returns a (B,) boolean array: whether any length-k window along a row, col,
+  or diagonal holds k signs. The window sums are built from k shifted slices.
+  '''
+  B, m, n = signs.shape
+  signs = signs.view(np.int8)
+  found = np.zeros(B, dtype=bool)
+  # Slices of the t-th cell of every window, for t in [0, k), per direction
+  windows = []
+  if n>=k: windows.append(lambda t: signs[:, :, t:n-k+1+t])                   # Row
+  if m>=k: windows.append(lambda t: signs[:, t:m-k+1+t, :])                   # Col
+  if m>=k and n>=k:
+    windows.append(lambda t: signs[:, t:m-k+1+t, t:n-k+1+t])                  # Diag1
+    windows.append(lambda t: signs[:, t:m-k+1+t, k-1-t:n-t])                  # Diag2
+  for window in windows:
+    total = window(0).copy()
+    for t in range(1, k): total += window(t)
+    found |= (total==k).any(axis=(1, 2))
+  return found
+
+def findWinners(boards:np.ndarray, k:int, numPlayers:Optional[int]=None)->np.ndarray:
+  '''
+  Returns the winner of each board: the index of the only player with k signs in a row,
+  -1 if no player has, or -2 if several players have (which cannot happen in a real game).
+  boards, k, numPlayers: as in connectedK.
+  '''
+  connected = connectedK(boards, k, numPlayers)
+  # Without numPlayers, boards with no sign have no player axis to take the argmax of
+  if connected.shape[-1]==0: return np.full(connected.shape[:-1], -1)
+  winners = np.where(connected.any(axis=-1), connected.argmax(axis=-1), -1)
+  winners[connected.sum(axis=-1)>1] = -2
+  return winners
+
+'''
+A rollout policy for MCTS that plays `numPlayouts` random games at once from the given state.
+Returns the mean utility of the playouts as a tuple, one element per player,
+so it can be used with utilitySumFunc=sumTuple as randomRollout.
+'''
+class BatchRandomRollout:
+  def __init__(self, numPlayouts:int=64, seed:Optional[int]=None):
+    self.numPlayouts = numPlayouts
+    self.rng = np.random.default_rng(seed)
+
+  def __call__(self, state:MNK)->Tuple:
+    batch = BatchMNK.fromStates([state]).repeat(self.numPlayouts)
+    utilities = batch.randomPlayout(self.rng)
+    return tuple(utilities.mean(axis=0).tolist())
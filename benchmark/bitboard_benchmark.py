@@ -0,0 +1,47 @@
+'''
+Per-call cost of the operations of a search on BitboardMNK against MNK, on the same mid-game positions,
+and the cost of a whole random rollout (mcts.randomRollout) from there, both classes playing the same games.
+The last column is the MNK time over the BitboardMNK time: above 1, BitboardMNK is faster.
+Run from the repository root: PYTHONPATH=. python benchmark/bitboard_benchmark.py
+'''
+
+import random
+import timeit
+from mnk import MNK, BitboardMNK
+from mcts import randomRollout
+from positions import midGameState
+
+def perCallMicroseconds(func, number:int=2000)->float:
+  return min(timeit.repeat(func, number=number, repeat=5))/number*1e6
+
+def makeAndUndo(state:MNK, action)->None:
+  state.makeMove(action)
+  state.undoMove()
+
+def seededRollout(state:MNK)->None:
+  random.seed(0)
+  randomRollout(state)
+
+def main():
+  print("%-8s %-28s %10s %12s %12s" % ("board", "operation", "MNK us", "Bitboard us", "MNK/Bitboard"))
+  for m, n, k in [(3, 3, 3), (8, 8, 4), (15, 15, 5)]:
+    random.seed(10)
+    state = midGameState(m, n, k, (m*n)//4)
+    random.seed(10)
+    bitboardState = midGameState(m, n, k, (m*n)//4, stateClass=BitboardMNK)
+    for s in (state, bitboardState): s.trackCandidates(2)
+    action = state.getActions()[0]
+    rows = [
+      ("getActions()", lambda s: s.getActions(), 2000),
+      ("getCandidateActions()", lambda s: s.getCandidateActions(), 2000),
+      ("makeMove() + undoMove()", lambda s: makeAndUndo(s, action), 2000),
+      ("clone()", lambda s: s.clone(), 2000),
+      ("getCellsView()", lambda s: s.getCellsView(), 2000),
+      ("random rollout", seededRollout, 20),
+    ]
+    for name, func, number in rows:
+      seconds = [perCallMicroseconds(lambda: func(s), number) for s in (state, bitboardState)]
+      print("%-8s %-28s %10.2f %12.2f %12.2f" % ("%dx%d" % (m, n), name, *seconds, seconds[0]/seconds[1]))
+
+if __name__ == "__main__":
+  main()
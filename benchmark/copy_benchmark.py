@@ -0,0 +1,34 @@
+'''
+Per-call cost of copying an MNK state and reading its board,
+before (pickle round-trips) and after (clone() and the read-only views).
+Run from the repository root: PYTHONPATH=. python benchmark/copy_benchmark.py
+'''
+
+import pickle
+import random
+import timeit
+from positions import midGameState
+
+def perCallMicroseconds(func, number:int=2000)->float:
+  return min(timeit.repeat(func, number=number, repeat=5))/number*1e6
+
+def main():
+  random.seed(10)
+  print("%-8s %-36s %12s" % ("board", "operation", "us/call"))
+  for m, n, k in [(3, 3, 3), (8, 8, 4), (15, 15, 5)]:
+    state = midGameState(m, n, k, (m*n)//4, ["O", "X"])
+    action = state.getActions()[0]
+    rows = [
+      ("state copy: pickle round-trip", lambda: pickle.loads(pickle.dumps(state))),
+      ("state copy: clone()", lambda: state.clone()),
+      ("takeAction (uses clone())", lambda: state.takeAction(action)),
+      ("board copy: pickle round-trip", lambda: pickle.loads(pickle.dumps(state.board))),
+      ("board copy: getBoard()", lambda: state.getBoard()),
+      ("board view: getBoardView() cached", lambda: state.getBoardView()),
+      ("board view: getCellsView()", lambda: state.getCellsView()),
+    ]
+    for name, func in rows:
+      print("%-8s %-36s %12.2f" % ("%dx%d" % (m, n), name, perCallMicroseconds(func)))
+
+if __name__ == "__main__":
+  main()
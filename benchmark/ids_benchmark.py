@@ -0,0 +1,56 @@
+'''
+Depth completed by MinimaxIDS within the time budgets of experiment35.py, per search configuration.
+Each row runs the IDS in a child process for `time` seconds, as MinimaxIDS.search does,
+and reports the deepest iteration that finished, then the time an in-process IDS takes to finish a fixed depth.
+The experiment35 settings key the unbounded cache on absolute depth, so from the second iteration on
+the root's children are answered from the cache: their depths are not comparable to the other rows.
+Run from the repository root: PYTHONPATH=. python benchmark/ids_benchmark.py
+'''
+
+import random
+import time
+from mnk import MNK
+from positions import midGameState, depthReached
+from evaluation import utilityMNK
+from minimax import MinimaxIDS, KillerHistoryExpansion, cacheExpansion
+
+CONFIGURATIONS = [
+  ("experiment35 settings", lambda: (cacheExpansion, dict(toCache=True))),
+  ("cacheExpansion + TT", lambda: (cacheExpansion, dict(toCache=True, cacheSize=1<<18))),
+  ("killer/history + TT + hash move", lambda: (KillerHistoryExpansion(), dict(toCache=True, cacheSize=1<<18, toOrderHashMove=True, inPlace=True))),
+  ("  + PVS", lambda: (KillerHistoryExpansion(), dict(toCache=True, cacheSize=1<<18, toOrderHashMove=True, inPlace=True, toPVS=True))),
+  ("  + PVS + aspiration(2)", lambda: (KillerHistoryExpansion(), dict(toCache=True, cacheSize=1<<18, toOrderHashMove=True, inPlace=True, toPVS=True, aspirationWindow=2))),
+]
+
+def secondsToDepth(agent:MinimaxIDS, state:MNK, depth:int)->float:
+  start = time.time()
+  for agent.depth in range(1, depth+1):
+    agent.searchDepth(state)
+  return time.time()-start
+
+BOARDS = [(8, 8, 4, 4), (10, 10, 5, 3), (12, 12, 6, 3), (15, 15, 8, 3)] # m, n, k, fixed depth
+
+def main():
+  print("%-14s %-34s %6s %6s" % ("board", "configuration", "3s", "5s"))
+  for m, n, k, _ in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for name, configuration in CONFIGURATIONS:
+      depths = []
+      for t in [3, 5]:
+        policy, kwargs = configuration()
+        depths.append(depthReached(MinimaxIDS(t, 15, utilityMNK, policy, **kwargs), state))
+      print("%-14s %-34s %6d %6d" % ("%dx%d k=%d" % (m, n, k), name, *depths))
+
+  print()
+  print("%-14s %-34s %12s" % ("board", "configuration", "sec to depth"))
+  for m, n, k, depth in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for name, configuration in CONFIGURATIONS[2:]:
+      policy, kwargs = configuration()
+      seconds = secondsToDepth(MinimaxIDS(0, depth, utilityMNK, policy, **kwargs), state, depth)
+      print("%-14s %-34s %12.2f" % ("%dx%d k=%d d=%d" % (m, n, k, depth), name, seconds))
+
+if __name__ == "__main__":
+  main()
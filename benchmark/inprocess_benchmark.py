@@ -0,0 +1,45 @@
+'''
+MinimaxIDS and MCTS searching in this process (inProcess=True) against a child process killed when time is up.
+For every board and time limit it reports how long search() takes in each mode, and, in this process,
+the deepest completed iteration (MinimaxIDS) or the number of iterations (MCTS), which the child process cannot report.
+Run from the repository root: PYTHONPATH=. python benchmark/inprocess_benchmark.py
+'''
+
+import random
+import time
+from mnk import MNK
+from positions import midGameState
+from evaluation import utilityMNK
+from minimax import MinimaxIDS, KillerHistoryExpansion
+from mcts import MCTS, UCB, linearExpansion, randomRollout
+from utils import sumTuple
+
+AGENTS = [
+  ("MinimaxIDS", lambda t, inProcess: MinimaxIDS(t, 15, utilityMNK, KillerHistoryExpansion(), toCache=True, cacheSize=1<<18,
+                                                  toOrderHashMove=True, inPlace=True, inProcess=inProcess), {}, "depth"),
+  ("MCTS", lambda t, inProcess: MCTS(UCB(utilityIdx=[0]), linearExpansion, randomRollout, sumTuple, utilityIdx=[0],
+                                     inPlace=True, inProcess=inProcess), {"maxTimeSec": None}, "iterations"),
+]
+BOARDS = [(8, 8, 4), (15, 15, 5)]
+
+def timedSearch(agent, state:MNK, kwargs:dict)->float:
+  start = time.time()
+  agent.search(state, **kwargs)
+  return time.time()-start
+
+def main():
+  print("%-12s %-12s %4s %14s %12s %17s" % ("board", "agent", "time", "child process", "in process", "in process stats"))
+  for m, n, k in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for name, makeAgent, kwargs, statistic in AGENTS:
+      for t in [1, 3]:
+        kwargs = {key: (lambda: t) for key in kwargs}
+        childSeconds = timedSearch(makeAgent(t, False), state, kwargs)
+        agent = makeAgent(t, True)
+        seconds = timedSearch(agent, state, kwargs)
+        print("%-12s %-12s %4d %13.3fs %11.3fs %10s %6d" % ("%dx%d k=%d" % (m, n, k), name, t, childSeconds, seconds,
+                                                           statistic, agent.searchStats[statistic]))
+
+if __name__ == "__main__":
+  main()
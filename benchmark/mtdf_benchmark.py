@@ -0,0 +1,47 @@
+'''
+MinimaxMTDF against MinimaxIDS with the same move ordering and transposition table:
+nodes searched (edges walked) and time to finish a fixed depth in-process,
+then the depth finished within the time budgets of experiment35.py, in a child process as MinimaxIDS.search does.
+Run from the repository root: PYTHONPATH=. python benchmark/mtdf_benchmark.py
+'''
+
+import random
+import time
+from positions import midGameState, depthReached
+from evaluation import utilityMNK
+from minimax import MinimaxIDS, MinimaxMTDF, KillerHistoryExpansion
+
+CONFIGURATIONS = [
+  ("MinimaxIDS", lambda t, d: MinimaxIDS(t, d, utilityMNK, KillerHistoryExpansion(), True, cacheSize=1<<18, toOrderHashMove=True, inPlace=True)),
+  ("MinimaxIDS + PVS", lambda t, d: MinimaxIDS(t, d, utilityMNK, KillerHistoryExpansion(), True, cacheSize=1<<18, toOrderHashMove=True, inPlace=True, toPVS=True)),
+  ("MinimaxMTDF", lambda t, d: MinimaxMTDF(t, d, utilityMNK, KillerHistoryExpansion(), cacheSize=1<<18, toOrderHashMove=True, inPlace=True)),
+]
+BOARDS = [(8, 8, 4, 4), (10, 10, 5, 3), (15, 15, 8, 3)] # m, n, k, fixed depth
+
+def main():
+  print("%-16s %-18s %10s %8s %10s %8s" % ("board", "search", "nodes", "sec", "nodes/sec", "passes"))
+  for m, n, k, depth in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for name, agentFactory in CONFIGURATIONS:
+      agent = agentFactory(0, depth)
+      agent.nodes = 0
+      passes = 0
+      start = time.time()
+      for agent.depth in range(1, depth+1):
+        agent.searchDepth(state)
+        passes += getattr(agent, "numPasses", 1)
+      seconds = time.time()-start
+      print("%-16s %-18s %10d %8.2f %10.0f %8d" % ("%dx%d k=%d d=%d" % (m, n, k, depth), name, agent.nodes, seconds, agent.nodes/seconds, passes))
+
+  print()
+  print("%-16s %-18s %6s %6s" % ("board", "search", "3s", "5s"))
+  for m, n, k, _ in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for name, agentFactory in CONFIGURATIONS:
+      depths = [depthReached(agentFactory(t, 15), state) for t in [3, 5]]
+      print("%-16s %-18s %6d %6d" % ("%dx%d k=%d" % (m, n, k), name, *depths))
+
+if __name__ == "__main__":
+  main()
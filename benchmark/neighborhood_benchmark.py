@@ -0,0 +1,76 @@
+'''
+Branching factor and search cost with the neighborhood candidate moves (MNK.trackCandidates).
+1. On the square boards experiment35.py sweeps, the mean number of actions over the positions of a game played
+   by two depth-1 Minimax agents considering every empty cell, against the candidates within radius 1 and 2.
+2. The cost of a fixed-depth search from a middle game position, with every empty cell or only the candidates.
+3. The cost of one makeMove()+undoMove() with and without tracking the candidates.
+Run from the repository root: PYTHONPATH=. python benchmark/neighborhood_benchmark.py
+'''
+
+import random
+import time
+from math import ceil
+from mnk import MNK
+from evaluation import utilityMNK
+from minimax import Minimax, KillerHistoryExpansion, linearExpansion
+
+def gamePositions(m:int, n:int, k:int, numPlies:int)->list:
+  state, positions = MNK(m, n, k, ["X", "O"]), []
+  agent = Minimax(1, utilityMNK, linearExpansion, inPlace=True)
+  while len(positions)<numPlies and not state.isTerminal():
+    state.makeMove(agent.search(state))
+    positions.append(state.clone())
+  return positions
+
+def meanBranching(positions:list, radius:int=None)->float:
+  total = 0
+  for state in positions:
+    if radius is None: total += len(state.getActionIndices())
+    else:
+      state = state.clone()
+      state.trackCandidates(radius)
+      total += len(state.getCandidateIndices())
+  return total/len(positions)
+
+def searchCost(state:MNK, depth:int, radius:int=None)->tuple:
+  agent = Minimax(depth, utilityMNK, KillerHistoryExpansion(candidateRadius=radius), toCache=True, cacheSize=1<<18,
+                  inPlace=True, toOrderHashMove=True)
+  start = time.time()
+  action = agent.search(state.clone())
+  return agent.nodes, time.time()-start, action
+
+def moveCost(state:MNK, numMoves:int=20000)->float:
+  actions = state.getActions()
+  start = time.time()
+  for i in range(numMoves):
+    state.makeMove(actions[i%len(actions)])
+    state.undoMove()
+  return (time.time()-start)/numMoves
+
+def main():
+  print("%-12s %10s %12s %12s %8s" % ("board", "all cells", "radius 1", "radius 2", "factor"))
+  middleGames = {}
+  for m in range(8, 16):
+    k = ceil(m/2)+1
+    random.seed(10)
+    positions = gamePositions(m, m, k, 20)
+    middleGames[m] = (positions[len(positions)//2], k)
+    full, near1, near2 = meanBranching(positions), meanBranching(positions, 1), meanBranching(positions, 2)
+    print("%-12s %10.1f %12.1f %12.1f %7.1fx" % ("%dx%d k=%d" % (m, m, k), full, near1, near2, full/near2))
+
+  print()
+  print("%-16s %-10s %10s %8s %8s" % ("board", "actions", "nodes", "sec", "move"))
+  for m, depth in [(10, 3), (15, 3)]:
+    state, k = middleGames[m]
+    for name, radius in [("all", None), ("radius 2", 2), ("radius 1", 1)]:
+      nodes, seconds, action = searchCost(state, depth, radius)
+      print("%-16s %-10s %10d %8.2f %8s" % ("%dx%d k=%d d=%d" % (m, m, k, depth), name, nodes, seconds, action))
+
+  print()
+  state, _ = middleGames[15]
+  tracked = state.clone()
+  tracked.trackCandidates(2)
+  print("makeMove+undoMove on 15x15: %.2fus, %.2fus tracking radius 2" % (1e6*moveCost(state.clone()), 1e6*moveCost(tracked)))
+
+if __name__ == "__main__":
+  main()
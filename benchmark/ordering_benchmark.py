@@ -0,0 +1,40 @@
+'''
+Nodes searched by iterative deepening Minimax to a fixed depth under different move orderings.
+Every row searches depths 1..depth on the same position with alpha-beta pruning and
+counts the edges walked (makeMove calls) over all iterations.
+Run from the repository root: PYTHONPATH=. python benchmark/ordering_benchmark.py
+The unordered 15x15 rows take several minutes.
+'''
+
+import random
+import time
+from mnk import MNK
+from positions import midGameState
+from evaluation import utilityMNK
+from minimax import Minimax, KillerHistoryExpansion, linearExpansion
+
+def iterativeDeepening(state:MNK, depth:int, expansionPolicy, **kwargs):
+  agent = Minimax(1, utilityMNK, expansionPolicy, inPlace=True, **kwargs)
+  agent.nodes = 0
+  start = time.time()
+  for agent.depth in range(1, depth+1):
+    action = agent.search(state, resetCache=False)
+  return agent.nodes, time.time()-start, action
+
+def main():
+  configurations = [
+    ("linear", lambda: linearExpansion, {}),
+    ("linear + hash move", lambda: linearExpansion, dict(toCache=True, cacheSize=1<<16, toOrderHashMove=True)),
+    ("killer/history", KillerHistoryExpansion, {}),
+    ("killer/history + hash move", KillerHistoryExpansion, dict(toCache=True, cacheSize=1<<16, toOrderHashMove=True)),
+  ]
+  print("%-14s %-28s %10s %8s %8s" % ("board", "ordering", "nodes", "sec", "move"))
+  for m, n, k, numMoves, depth in [(8, 8, 4, 6, 3), (10, 10, 5, 8, 3), (15, 15, 5, 10, 3)]:
+    random.seed(11)
+    state = midGameState(m, n, k, numMoves)
+    for name, policy, kwargs in configurations:
+      nodes, seconds, action = iterativeDeepening(state, depth, policy(), **kwargs)
+      print("%-14s %-28s %10d %8.2f %8s" % ("%dx%d k=%d d=%d" % (m, n, k, depth), name, nodes, seconds, action))
+
+if __name__ == "__main__":
+  main()
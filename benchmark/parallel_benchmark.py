@@ -0,0 +1,33 @@
+'''
+Depth completed and edges walked per second by MinimaxLazySMP, per number of workers,
+within the time budgets of experiment35.py.
+The workers share the one table and race on the same root, so the speedup shows as a deeper
+completed iteration for the same time; on a machine with fewer cores than workers they only take turns.
+Run from the repository root: PYTHONPATH=. python benchmark/parallel_benchmark.py
+'''
+
+import os
+import random
+from positions import midGameState
+from evaluation import utilityMNK
+from minimax import MinimaxLazySMP, KillerHistoryExpansion
+
+BOARDS = [(8, 8, 4), (10, 10, 5), (15, 15, 5)]
+WORKERS = [1, 2, 4, 8]
+
+def main():
+  print("cpus: %d" % os.cpu_count())
+  print("%-12s %8s %6s %12s %6s %12s" % ("board", "workers", "3s", "nodes/s", "5s", "nodes/s"))
+  for m, n, k in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for numWorkers in WORKERS:
+      row = []
+      for t in [3, 5]:
+        agent = MinimaxLazySMP(t, 15, utilityMNK, KillerHistoryExpansion(), numWorkers, inPlace=True, cacheSize=1<<18)
+        agent.search(state)
+        row += [agent.searchStats["depth"], agent.searchStats["nodes"]/t]
+      print("%-12s %8d %6d %12.0f %6d %12.0f" % ("%dx%d k=%d" % (m, n, k), numWorkers, *row))
+
+if __name__ == "__main__":
+  main()
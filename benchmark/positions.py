@@ -0,0 +1,40 @@
+'''
+Positions and measurements shared by the benchmarks. The benchmarks run as scripts from benchmark/, so they import it as
+  from positions import midGameState, depthReached
+'''
+
+import random
+from multiprocessing import Manager, Process
+from typing import Any, Sequence
+from mnk import MNK
+from minimax import MinimaxIDS
+
+def midGameState(m:int, n:int, k:int, numMoves:int, playerSigns:Sequence[Any]=("X", "O"), stateClass:type=MNK)->MNK:
+  '''
+  Returns the position after `numMoves` random moves from the empty m*n board, drawn from the `random` module,
+  so seeding it fixes the position. Every stateClass (MNK, BitboardMNK) lists its actions in the same order,
+  so they reach the same position from the same seed.
+  '''
+  state = stateClass(m, n, k, list(playerSigns))
+  for _ in range(numMoves):
+    state.makeMove(random.choice(state.getActions()))
+  return state
+
+def depthReached(agent:MinimaxIDS, state:MNK)->int:
+  '''
+  Returns the number of iterations the agent completes on `state` within agent.time seconds,
+  in a child process killed when time is up, as MinimaxIDS.search runs it.
+  '''
+  with Manager() as manager:
+    q = manager.Queue()
+    p = Process(target=agent._search, args=(state, q))
+    p.start()
+    p.join(agent.time)
+    if p.is_alive():
+      p.terminate()
+      p.join()
+    depth = 0
+    while not q.empty():
+      q.get()
+      depth+=1
+  return depth
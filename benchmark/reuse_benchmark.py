@@ -0,0 +1,55 @@
+'''
+Transposition table reuse across the moves of a game (Minimax toReuseCache) against a table emptied every move.
+The roots are the positions met by an agent playing X against random moves, replayed in the same order for both
+settings. Every root is searched to a fixed depth in this process, and the table reports the edges walked,
+the time, and how often both settings choose the same action (a reused entry may come from a deeper search).
+Run from the repository root: PYTHONPATH=. python benchmark/reuse_benchmark.py
+'''
+
+import random
+import time
+from mnk import MNK
+from evaluation import utilityMNK
+from minimax import MinimaxIDS, KillerHistoryExpansion
+
+def makeAgent(depth:int, toReuseCache:bool)->MinimaxIDS:
+  return MinimaxIDS(1000, depth, utilityMNK, KillerHistoryExpansion(), toCache=True, cacheSize=1<<18,
+                    toOrderHashMove=True, inPlace=True, inProcess=True, toReuseCache=toReuseCache)
+
+def gameRoots(m:int, n:int, k:int, depth:int, numMoves:int)->list:
+  '''
+  Returns the positions where X, played by a fresh agent, is to move in a game against random moves
+  '''
+  state, roots = MNK(m, n, k, ["X", "O"]), []
+  agent = makeAgent(depth, False)
+  while len(roots)<numMoves and not state.isTerminal():
+    roots.append(state.clone())
+    state.makeMove(agent.search(state))
+    if not state.isTerminal(): state.makeMove(random.choice(state.getActions()))
+  return roots
+
+def playRoots(roots:list, depth:int, toReuseCache:bool)->tuple:
+  agent = makeAgent(depth, toReuseCache)
+  actions, nodes, start = [], 0, time.time()
+  for state in roots:
+    actions.append(agent.search(state))
+    nodes += agent.searchStats["nodes"]
+  return actions, nodes, time.time()-start
+
+BOARDS = [(8, 8, 4, 4), (10, 10, 5, 3), (15, 15, 5, 3)] # m, n, k, depth
+NUM_MOVES = 8
+
+def main():
+  print("%-16s %-14s %10s %8s %12s" % ("board", "table", "nodes", "sec", "same action"))
+  for m, n, k, depth in BOARDS:
+    random.seed(10)
+    roots = gameRoots(m, n, k, depth, NUM_MOVES)
+    freshActions, freshNodes, freshSeconds = playRoots(roots, depth, False)
+    actions, nodes, seconds = playRoots(roots, depth, True)
+    same = sum(a==b for a, b in zip(actions, freshActions))
+    board = "%dx%d k=%d d=%d" % (m, n, k, depth)
+    print("%-16s %-14s %10d %8.2f %12s" % (board, "fresh", freshNodes, freshSeconds, ""))
+    print("%-16s %-14s %10d %8.2f %9d/%d" % (board, "reused", nodes, seconds, same, len(roots)))
+
+if __name__ == "__main__":
+  main()
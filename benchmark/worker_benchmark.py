@@ -0,0 +1,43 @@
+'''
+Per-move overhead of running a search in another process: a new Manager and Process per move
+(MinimaxIDS.search, MCTS.search) against a persistent workers.SearchWorker.
+The searches are given no work (maxDepth 0, maxIteration 0), so the time measured is the overhead alone.
+Run from the repository root: PYTHONPATH=. python benchmark/worker_benchmark.py
+'''
+
+import random
+import time
+from mnk import MNK
+from positions import midGameState
+from evaluation import utilityMNK
+from minimax import MinimaxIDS, cacheExpansion
+from mcts import MCTS, UCB, linearExpansion, randomRollout
+from workers import SearchWorker
+
+AGENTS = [
+  ("MinimaxIDS", lambda: MinimaxIDS(5, 0, utilityMNK, cacheExpansion, toCache=True), {}),
+  ("MCTS", lambda: MCTS(UCB(), linearExpansion, randomRollout), {"maxIteration": lambda: 0, "maxTimeSec": lambda: 5}),
+]
+BOARDS = [(8, 8, 4), (15, 15, 5)]
+NUM_MOVES = 20
+
+def secondsPerMove(agent, state:MNK, kwargs:dict)->float:
+  start = time.time()
+  for _ in range(NUM_MOVES):
+    agent.search(state, **kwargs)
+  return (time.time()-start)/NUM_MOVES
+
+def main():
+  print("%-12s %-12s %18s %14s" % ("board", "agent", "process per move", "SearchWorker"))
+  for m, n, k in BOARDS:
+    random.seed(10)
+    state = midGameState(m, n, k, 6)
+    for name, makeAgent, kwargs in AGENTS:
+      perMove = secondsPerMove(makeAgent(), state, kwargs)
+      worker = SearchWorker(makeAgent())
+      perMoveWorker = secondsPerMove(worker, state, kwargs)
+      worker.close()
+      print("%-12s %-12s %16.1fms %12.1fms" % ("%dx%d k=%d" % (m, n, k), name, 1000*perMove, 1000*perMoveWorker))
+
+if __name__ == "__main__":
+  main()
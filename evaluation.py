@@ -0,0 +1,357 @@
+from mnk import MNK
+from geometry import boardGeometry
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+import numpy as np
+
+LARGE_WIN_UTILITY = 1000000000
+
+def utilityMNK(state:MNK, depth:int):
+  '''
+  This is a heuristic that calculates the utility of a state.
+  It assumes a minimizer calling this function from odd depth,
+  and a maximizer from the even depth.
+  '''
+  utility = 0
+  weightPerSign = 1/state.k  # assuming each sign is equally important regardless of where it is placed
+  board = state.getBoardView()
+
+  def calculateUtility(lst):
+    utility = 0
+    consecEmptyCells = 0            # Number of consecutive empty cells
+    emptyCellsReqToWin = state.k    # Empty cells required to win. An empty cell implies an opportunity to place a sign to win
+    candidateWinningPos = []        # This is wipe out when a possible winning path is interrupted by the other players. 
+                                    #The length of it reflects the number of same signs placed uninterupted.
+    prevSign = None
+    for idx, sign in enumerate(lst):
+      ## Empty Sign ##
+      if sign==state.emptySign:
+        consecEmptyCells+=1
+        emptyCellsReqToWin-=1
+      ## End Empty Sign ##
+      else:
+      ## Player Sign (nonEmpty Sign)##
+        if sign!=prevSign: candidateWinningPos = []
+        prevSign = sign
+        emptyCellsReqToWin = emptyCellsReqToWin-1 if candidateWinningPos else (state.k-consecEmptyCells-1)
+        consecEmptyCells = 0
+        candidateWinningPos.append(idx+state.k-1)
+      ## End Player Sign (nonEmpty Sign)##
+      ## Update Utility if there's a way to win ##
+      if emptyCellsReqToWin<=0:
+        direction = 1 if prevSign==state.getCurrentPlayerSign() else -1
+        utility+=direction*weightPerSign*len(candidateWinningPos)
+        ## If WIN ##
+        if len(candidateWinningPos)==state.k: return direction*LARGE_WIN_UTILITY
+        ## End if WIN ##
+        ## Additional Reward/Punishment for one-step win/lose ##
+        if len(candidateWinningPos)+1 == state.k:
+          # Else: I could still block but wasted a move
+          bonus = 1*state.k if prevSign==state.getCurrentPlayerSign() else -2*state.k 
+          utility+=bonus
+      ## End Update Utility
+      if candidateWinningPos and candidateWinningPos[0]==idx:
+        # Pop it out because it no longer within the window of being helpful to win
+        # in the next iteration
+        candidateWinningPos.pop(0)
+    return utility
+
+  ## ROW, COL, Diag1 and Diag2 utility ##
+  # The diagonals too short to hold k signs are left out (see BoardGeometry)
+  cells = [sign for row in board for sign in row]
+  for line, skipIfEmpty in boardGeometry(state.m, state.n, state.k).utilityLines:
+    signs = [cells[idx] for idx in line]
+    # Next iteration if no playerSign --> no need to count utility
+    if skipIfEmpty and not any(sign in signs for sign in state.playerSigns):
+      continue
+    utility+=calculateUtility(signs)
+
+  # Its a minimizer at odd depth
+  return -utility if depth%2==1 else utility
+
+def threatUtility(state:MNK, depth:int)->float:
+  '''
+  A heuristic in the spirit of utilityMNK, computed from the threat counts that
+  the state keeps up to date (MNK(..., trackThreats=True)), so it costs O(players*k) per call.
+  Every window still open for a player is worth (its number of signs)/k, plus a bonus of k
+  for the current player's open k-1 windows, or a penalty of 2k for the other players'.
+  It assumes a minimizer calling this function from odd depth,
+  and a maximizer from the even depth.
+  '''
+  currentPlayerSign = state.getCurrentPlayerSign()
+  weightPerSign = 1/state.k
+  utility = 0
+  for sign in state.playerSigns:
+    threats = state.getThreatCounts(sign)
+    direction = 1 if sign==currentPlayerSign else -1
+    if threats[state.k]:
+      utility = direction*LARGE_WIN_UTILITY
+      break
+    utility += direction*weightPerSign*sum(numSigns*count for numSigns, count in enumerate(threats))
+    utility += threats[state.k-1]*(1*state.k if direction==1 else -2*state.k)
+  # Its a minimizer at odd depth
+  return -utility if depth%2==1 else utility
+
+@lru_cache(maxsize=None)
+def utilityLines(m:int, n:int, k:int)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+  '''
+  Returns the lines of BoardGeometry.utilityLines as arrays:
+  indices: (numLines, maxLength) flat cell indices of each line, padded at the end
+  valid: (numLines, maxLength) False on the padding
+  skipIfEmpty: (numLines,) whether a line without signs is skipped (rows and cols are, diagonals are not)
+  '''
+  lines, skipIfEmpty = zip(*boardGeometry(m, n, k).utilityLines)
+  maxLength = max(map(len, lines))
+  indices = np.zeros((len(lines), maxLength), dtype=np.intp)
+  valid = np.zeros((len(lines), maxLength), dtype=bool)
+  for lineIdx, line in enumerate(lines):
+    indices[lineIdx, :len(line)] = line
+    valid[lineIdx, :len(line)] = True
+  return indices, valid, np.array(skipIfEmpty)
+
+def batchUtilityMNK(boards:np.ndarray, k:int, currentPlayers:np.ndarray, depth:int=0)->np.ndarray:
+  '''
+  Scores many positions at once with the utilityMNK heuristic.
+  boards: (B, m, n) array of player codes (0 empty, playerIdx+1 otherwise, as MNK.getCellsView())
+  k: number of connected signs to win
+  currentPlayers: (B,) index of the player to move in each position
+  depth: as in utilityMNK, the scores are negated at odd depth
+  Returns the (B,) scores, equal to utilityMNK up to floating-point rounding.
+
+  It runs the state machine of utilityMNK one cell position at a time, over every line of every
+  board at once. The candidate list of utilityMNK is replaced by counts: the last player to place
+  a sign on a line scores its signs among the last k cells since another player's sign, once the
+  run of cells it may still use is k long.
+  '''
+  boards = np.asarray(boards)
+  B, m, n = boards.shape
+  indices, valid, skipIfEmpty = utilityLines(m, n, k)
+  numLines, length = indices.shape
+  # (position along the line, every line of every board)
+  signs = boards.reshape(B, m*n)[:, indices.T].transpose(1, 0, 2).reshape(length, B*numLines).astype(np.int8)
+  valid = np.tile(valid.T, (1, B))
+  signs[~valid] = 0
+  current = np.repeat((np.asarray(currentPlayers)+1).astype(np.int8), numLines)
+  size = B*numLines
+  prevSign = np.zeros(size, dtype=np.int8)              # Last sign placed on the line so far, 0 if none
+  lastSignPos = np.full(size, -1, dtype=np.int16)       # Its position
+  usableStart = np.zeros(size, dtype=np.int16)          # First cell the last player may still use to win
+  signCount = np.zeros(size, dtype=np.int16)            # Number of signs so far
+  runStartCount = np.zeros(size, dtype=np.int16)        # Number of signs before the last player's current run
+  signCountHistory = []                                 # signCount before each position
+  signedSigns = np.zeros(size, dtype=np.int32)          # Sum of +-numSigns over the scoring cells
+  bonuses = np.zeros(size, dtype=np.int32)              # Sum of the one-step win/lose bonuses
+  won = np.zeros(size, dtype=bool)
+  wonMine = np.zeros(size, dtype=bool)
+  for position in range(length):
+    sign = signs[position]
+    nonEmpty = sign>0
+    newPlayer = nonEmpty & (sign!=prevSign)
+    # Another player's sign, or the player's previous sign k or more cells away, restarts the usable cells
+    restart = nonEmpty & (newPlayer | (position-lastSignPos>=k))
+    usableStart = np.where(restart, lastSignPos+1, usableStart)
+    runStartCount = np.where(newPlayer, signCount, runStartCount)
+    signCountHistory.append(signCount)
+    signCount = signCount+nonEmpty
+    prevSign = np.where(nonEmpty, sign, prevSign)
+    lastSignPos = np.where(nonEmpty, np.int16(position), lastSignPos)
+    # The player's signs among the last k cells of its current run
+    windowCount = signCount-signCountHistory[position-k+1] if position>=k-1 else signCount
+    numSigns = np.minimum(windowCount, signCount-runStartCount)
+    scoring = (position-usableStart>=k-1) & valid[position]
+    mine = prevSign==current
+    signedSigns += np.where(scoring, np.where(mine, numSigns, -numSigns), 0)
+    bonuses += np.where(scoring & (numSigns==k-1), np.where(mine, k, -2*k), 0)
+    newWin = scoring & (numSigns==k) & ~won
+    wonMine |= newWin & mine
+    won |= newWin
+  lineUtility = signedSigns/k + bonuses
+  # A line with k connected signs is worth LARGE_WIN_UTILITY on its own
+  lineUtility = np.where(won, np.where(wonMine, LARGE_WIN_UTILITY, -LARGE_WIN_UTILITY), lineUtility)
+  lineUtility[np.tile(skipIfEmpty, B) & ~(signCount>0)] = 0
+  utility = lineUtility.reshape(B, numLines).sum(axis=1)
+  # Its a minimizer at odd depth
+  return -utility if depth%2==1 else utility
+
+def vectorizedUtilityMNK(state:MNK, depth:int)->float:
+  '''
+  Same score as utilityMNK, computed with batchUtilityMNK.
+  '''
+  board = np.frombuffer(state.getCellsView(), dtype=np.uint8).reshape(1, state.m, state.n)
+  currentPlayer = state.playerIndex[state.getCurrentPlayerSign()]
+  return float(batchUtilityMNK(board, state.k, np.array([currentPlayer]), depth)[0])
+
+'''
+The score of every possible length-k window, precomputed once per (k, numPlayers).
+A window is encoded as the base-(numPlayers+1) integer of its cell codes
+(0 empty, playerIdx+1 otherwise, as MNK.getCellsView()), the first cell being the least significant digit.
+The scores follow threatUtility: a window holding only one player's signs is worth (its number of signs)/k,
+plus a bonus of k if it is the current player's open k-1 window, or a penalty of 2k if it is another player's.
+'''
+class PatternTable:
+  def __init__(self, k:int, numPlayers:int, scores:Optional[np.ndarray]=None, winners:Optional[np.ndarray]=None) -> None:
+    '''
+    k: number of connected signs to win, which is the window length
+    numPlayers: number of players
+    scores, winners: the tables, as built by build(). They are built if not given.
+    '''
+    self.k = k
+    self.numPlayers = numPlayers
+    self.base = numPlayers+1
+    self.powers = self.base**np.arange(k, dtype=np.int64)
+    if scores is None or winners is None: scores, winners = self.build()
+    if scores.shape!=(numPlayers, self.base**k) or winners.shape!=(self.base**k,):
+      raise Exception("The pattern tables do not match k and numPlayers.")
+    self.scores = scores
+    self.winners = winners
+
+  def build(self)->Tuple[np.ndarray, np.ndarray]:
+    '''
+    Returns (scores, winners):
+    scores[currentPlayer][pattern]: the score of a window from the point of view of currentPlayer (0 if a player won it)
+    winners[pattern]: the player with k signs in the window, -1 if there is none
+    '''
+    k, numPlayers = self.k, self.numPlayers
+    patterns = np.arange(self.base**k, dtype=np.int64)
+    digits = patterns[:, np.newaxis]//self.powers%self.base
+    totals = (digits>0).sum(axis=1)
+    winners = np.full(patterns.size, -1, dtype=np.int8)
+    scores = np.zeros((numPlayers, patterns.size))
+    for playerIdx in range(numPlayers):
+      numSigns = (digits==playerIdx+1).sum(axis=1)
+      # Open for the player: it holds the player's signs and no other sign
+      isOpen = (numSigns>0) & (numSigns==totals)
+      winners[isOpen & (numSigns==k)] = playerIdx
+      for currentPlayer in range(numPlayers):
+        mine = playerIdx==currentPlayer
+        score = (1 if mine else -1)*numSigns/k + np.where(numSigns==k-1, k if mine else -2*k, 0)
+        scores[currentPlayer] += np.where(isOpen, score, 0)
+    scores[:, winners>=0] = 0
+    return scores, winners
+
+  def encode(self, cells:np.ndarray, windows:np.ndarray)->np.ndarray:
+    '''
+    Returns the patterns of `windows` (an array of flat cell indices, one row per window) on the flat board `cells`.
+    '''
+    return cells[windows]@self.powers
+
+  def evaluate(self, cells:np.ndarray, windows:np.ndarray, currentPlayer:int)->float:
+    '''
+    Returns the sum of the window scores, or +-LARGE_WIN_UTILITY if a player has k signs in a window.
+    '''
+    patterns = self.encode(cells, windows)
+    winners = self.winners[patterns]
+    if (winners>=0).any():
+      return LARGE_WIN_UTILITY if winners[winners>=0].min()==currentPlayer else -LARGE_WIN_UTILITY
+    return float(self.scores[currentPlayer][patterns].sum())
+
+  def save(self, path:str)->None:
+    '''
+    Save the tables to a .npz file
+    '''
+    np.savez(path, k=self.k, numPlayers=self.numPlayers, scores=self.scores, winners=self.winners)
+
+  @classmethod
+  def load(cls, path:str)->'PatternTable':
+    '''
+    Load tables saved by save()
+    '''
+    with np.load(path) as data:
+      return cls(int(data["k"]), int(data["numPlayers"]), data["scores"], data["winners"])
+
+@lru_cache(maxsize=None)
+def patternTable(k:int, numPlayers:int)->PatternTable:
+  '''
+  Returns the shared PatternTable for (k, numPlayers), built on first use.
+  '''
+  return PatternTable(k, numPlayers)
+
+@lru_cache(maxsize=None)
+def windowArray(m:int, n:int, k:int)->np.ndarray:
+  '''
+  Returns BoardGeometry.windows as a (numWindows, k) array of flat cell indices.
+  '''
+  windows = boardGeometry(m, n, k).windows
+  return np.array(windows, dtype=np.intp).reshape(len(windows), k)
+
+'''
+A heuristic that scores a state with a PatternTable: one table lookup per length-k window.
+It gives the same score as threatUtility without needing trackThreats,
+and can be used as Minimax's evaluationFunction or inside a rollout policy.
+'''
+class PatternUtility:
+  def __init__(self, table:Optional[PatternTable]=None):
+    '''
+    table: the PatternTable to use, for instance one loaded with PatternTable.load().
+           Defaults to the shared table of the state's (k, number of players).
+    '''
+    self.table = table
+
+  def __call__(self, state:MNK, depth:int)->float:
+    '''
+    It assumes a minimizer calling this function from odd depth,
+    and a maximizer from the even depth.
+    '''
+    table = self.table or patternTable(state.k, len(state.playerSigns))
+    if (table.k, table.numPlayers)!=(state.k, len(state.playerSigns)):
+      raise Exception("The pattern table does not match the state's k and number of players.")
+    cells = np.frombuffer(state.getCellsView(), dtype=np.uint8)
+    utility = table.evaluate(cells, windowArray(state.m, state.n, state.k), state.playerIndex[state.getCurrentPlayerSign()])
+    # Its a minimizer at odd depth
+    return -utility if depth%2==1 else utility
+
+'''
+A bounded LRU cache in front of an evaluation function, keyed by the game shape (m, n, k) and the position hash
+(MNK.zobristKey). The Zobrist keys do not depend on k, so the shape keeps games of different k apart.
+Evaluation functions follow the depth convention of utilityMNK: the score at odd depth is the negated
+score at even depth. So the cache stores evaluationFunction(state, 0) and flips the sign itself,
+and a position hits the cache whatever the depth it is evaluated at.
+One instance can be shared by several agents, e.g. Minimax(evaluationFunction=cache) and limitedRandomRollout(evaluationFunction=cache).
+'''
+class EvaluationCache:
+  def __init__(self, evaluationFunction:Callable[[MNK, int], float]=utilityMNK, maxSize:int=1<<20):
+    '''
+    evaluationFunction: the function to memoize, called as evaluationFunction(state, depth)
+    maxSize: the maximum number of cached positions. The least recently used position is dropped first.
+    '''
+    if maxSize<=0:
+      raise Exception("maxSize has to be positive")
+    self.evaluationFunction = evaluationFunction
+    self.maxSize = maxSize
+    self.table = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def __call__(self, state:MNK, depth:int)->float:
+    key = (state.m, state.n, state.k, state.zobristKey)
+    table = self.table
+    utility = table.get(key)
+    if utility is None:
+      self.misses+=1
+      utility = self.evaluationFunction(state, 0)
+      table[key] = utility
+      if len(table)>self.maxSize: table.popitem(last=False)
+    else:
+      self.hits+=1
+      table.move_to_end(key)
+    # Its a minimizer at odd depth
+    return -utility if depth%2==1 else utility
+
+  def __len__(self)->int:
+    return len(self.table)
+
+  def hitRate(self)->float:
+    '''
+    Returns the fraction of calls answered from the cache
+    '''
+    calls = self.hits+self.misses
+    return self.hits/calls if calls else 0.0
+
+  def clear(self)->None:
+    '''
+    Drop every cached position and reset the counters
+    '''
+    self.table.clear()
+    self.hits = 0
+    self.misses = 0
@@ -0,0 +1,121 @@
+from typing import Tuple, List, Dict, Optional
+from functools import lru_cache
+from prototype import State, Action
+
+'''
+The geometry of an m*n board for a k-in-a-row game, computed once per (m, n, k).
+Cells are referred to by their flat index i*n+j, and every line is a tuple of flat indices.
+It is shared by the win check, the evaluation functions, threat tracking and move generation,
+so none of them recomputes board geometry per node. Get it with boardGeometry(m, n, k).
+'''
+class BoardGeometry:
+  DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))  # Row, Col, Diag1, Diag2
+
+  def __init__(self, m:int, n:int, k:int) -> None:
+    self.m = m
+    self.n = n
+    self.k = k
+    self.rows = tuple(tuple(i*n+j for j in range(n)) for i in range(m))
+    self.cols = tuple(tuple(i*n+j for i in range(m)) for j in range(n))
+    # Diagonals and anti-diagonals long enough to hold k signs, in the order utilityMNK scans them
+    diagStarts = [(i, 0) for i in range(m-k+1)] + [(0, j) for j in range(1, n-k+1)]
+    self.diagonals = tuple(self._ray(i, j, 1, 1) for i, j in diagStarts)
+    antiDiagStarts = [(i, n-1) for i in range(m-k+1)] + [(0, j) for j in range(k-1, n-1)]
+    self.antiDiagonals = tuple(self._ray(i, j, 1, -1) for i, j in antiDiagStarts)
+    # The lines scored by utilityMNK, as (line, skipIfEmpty) pairs:
+    # the rows and the cols, skipped when they hold no sign, then the diagonals and anti-diagonals
+    self.utilityLines = tuple((line, True) for line in self.rows+self.cols) + \
+                        tuple((line, False) for line in self.diagonals+self.antiDiagonals)
+    # windows[w]: the w-th run of k cells along a row, col, or diagonal
+    windows = []
+    for dr, dc in self.DIRECTIONS:
+      for i in range(m):
+        for j in range(n):
+          if 0<=i+dr*(k-1)<m and 0<=j+dc*(k-1)<n:
+            windows.append(tuple((i+dr*t)*n+j+dc*t for t in range(k)))
+    self.windows = tuple(windows)
+    # windowsThroughCell[i*n+j]: the indices w of the windows covering the cell (i,j)
+    windowsThroughCell = [[] for _ in range(m*n)]
+    for w, window in enumerate(windows):
+      for index in window: windowsThroughCell[index].append(w)
+    self.windowsThroughCell = tuple(map(tuple, windowsThroughCell))
+    # segmentsThroughCell[i*n+j]: per direction, the cells at most k-1 steps away from (i,j), in order.
+    # A sign placed at (i,j) can only complete k in a row within these.
+    self.segmentsThroughCell = tuple(
+      tuple(self._segment(i, j, dr, dc) for dr, dc in self.DIRECTIONS) for i in range(m) for j in range(n))
+    # {radius: neighborhood(radius)}
+    self._neighborhoods = {}
+
+  def _ray(self, i:int, j:int, dr:int, dc:int)->Tuple[int, ...]:
+    '''
+    The cells from (i,j) to the border of the board along (dr, dc)
+    '''
+    ray = []
+    while 0<=i<self.m and 0<=j<self.n:
+      ray.append(i*self.n+j)
+      i, j = i+dr, j+dc
+    return tuple(ray)
+
+  def _segment(self, i:int, j:int, dr:int, dc:int)->Tuple[int, ...]:
+    steps = [step for step in range(-(self.k-1), self.k) if 0<=i+step*dr<self.m and 0<=j+step*dc<self.n]
+    return tuple((i+step*dr)*self.n+j+step*dc for step in steps)
+
+  def neighborhood(self, radius:int)->Tuple[Tuple[int, ...], ...]:
+    '''
+    Returns, for each cell, the other cells at most `radius` rows and cols away from it.
+    '''
+    if radius not in self._neighborhoods:
+      m, n = self.m, self.n
+      self._neighborhoods[radius] = tuple(
+        tuple(di*n+dj for di in range(max(0, i-radius), min(m, i+radius+1))
+                      for dj in range(max(0, j-radius), min(n, j+radius+1)) if (di, dj)!=(i, j))
+        for i in range(m) for j in range(n))
+    return self._neighborhoods[radius]
+
+@lru_cache(maxsize=None)
+def boardGeometry(m:int, n:int, k:int)->BoardGeometry:
+  '''
+  Returns the shared BoardGeometry of an m*n board with k in a row to win.
+  '''
+  return BoardGeometry(m, n, k)
+
+def candidateActions(state:State, radius:int)->List[Action]:
+  '''
+  Returns the actions on the candidate cells of an MNK state: the empty cells at most `radius` rows and cols
+  away from a sign (see BoardGeometry.neighborhood and MNK.getCandidateActions).
+  The state has to track them already: agents searching with a policy that has a `candidateRadius`
+  search a copy of the root tracking them (see candidateState).
+  '''
+  if state.candidateRadius!=radius:
+    raise Exception("The state does not track the candidates within radius %s. Create it with candidateRadius, or call trackCandidates()." % radius)
+  return state.getCandidateActions()
+
+def candidateState(state:State, radius:Optional[int], toCopy:bool=False)->State:
+  '''
+  Returns the state an agent should search from `state` with an expansion policy of candidateRadius `radius`
+  (None if the policy has no candidates): `state` itself if it tracks them already and not toCopy,
+  otherwise a copy tracking them. The caller's state is never changed.
+  '''
+  tracked = radius is None or state.candidateRadius==radius
+  if toCopy or not tracked:
+    state = state.clone()
+    if not tracked: state.trackCandidates(radius)
+  return state
+
+'''
+An expansion policy for large boards, keeping only the candidate cells of an MNK state:
+the empty cells at most `radius` rows and cols away from a sign, in row-major order.
+Almost all useful moves lie there, so the branching factor drops from every empty cell to a few dozen.
+Moves far from every sign are never searched, so the values are those of a narrower game tree.
+Minimax and MCTS read its `candidateRadius` when they are created, and search a copy of the root state
+tracking the candidates (see candidateState), updated on every move from then on.
+'''
+class NeighborhoodExpansion:
+  def __init__(self, radius:int=2):
+    self.candidateRadius = radius
+
+  def __call__(self, state:State, depth:int=0, cache:Optional[Dict]=None)->List[Action]:
+    '''
+    Minimax passes the depth and its cache, MCTS only the state; neither is used.
+    '''
+    return candidateActions(state, self.candidateRadius)
@@ -1,26 +1,35 @@
-from prototype import Search, State, Action
-from typing import Callable, Optional, Any, List, Union
+from prototype import Search, State, Action, ListQueue
+from typing import Callable, Optional, Any, List, Union, Tuple, Dict
 import time
 import random
 import math
-import pickle
 from multiprocessing import Manager, Process
+from geometry import NeighborhoodExpansion, candidateState
 
 
 '''
 A Prototype of a Node
 '''
 class Node:
-  def __init__(self, state:State, parent=None):
+  def __init__(self, state:Optional[State], parent=None, action:Optional[Action]=None):
+    '''
+    state: the state of this node. It is None if the tree is walked on one mutable state (see MCTS `inPlace`)
+    action: the action that leads from the parent node to this node
+    '''
     self.state = state
     self.parent = parent
-    self.children = {} # {action:Node(stateAfterAction, self)}
+    self.action = action
+    self.children = {} # {action:Node(stateAfterAction, self, action)}
     self.numVisits = 0
     self.utilities = None
   
-  def isLeaf(self)->bool:
+  def isLeaf(self, state:Optional[State]=None)->bool:
+    '''
+    state: the state of this node, if it is not stored in the node itself.
+    '''
+    if state is None: state = self.state
     # A terminal state is considered a leaf node
-    return len(self.children)==0 or self.state.isTerminal()
+    return len(self.children)==0 or state.isTerminal()
   
   def __str__(self, level=0):
     ret = "\t"*level+repr(self)+"\n"
@@ -55,7 +64,10 @@ class MCTS(Search):
                expansionPolicy:Callable[[State], List[Action]], 
                rollOutPolicy:Callable[[State],Any],  
                utilitySumFunc:Callable[[Any, Any], Any]=sum, 
-               utilityIdx:Optional[List[int]]=None
+               utilityIdx:Optional[List[int]]=None,
+               inPlace:bool=False,
+               reuseTree:bool=False,
+               inProcess:bool=False,
                ):
     '''
     selectionPolicy: Given the current node, which child node should be selected to traverse to?
@@ -64,12 +76,29 @@ class MCTS(Search):
     utilitySumFunc: function used to sum two rewards. The default is sum()
     utilityIdx: Applicable if the utilities are encoded with multiple elements, each representing different agents' utility
                   For example utility =(0,1,1). utilityIdx:=2 means that only utility[utilityIdx] is considered.
+    inPlace: whether to walk the tree on one mutable copy of the root state with `state.makeMove(action)`/`state.undoMove()`.
+             Nodes below the root then store no state of their own.
+    reuseTree: whether to keep the tree between searches. The next search starts from the subtree of the new root
+               state if it is at most two plies below the previous root, so the statistics gathered there are kept.
+               The tree only survives in the process running the searches, see workers.SearchWorker and `inProcess`.
+    inProcess: whether search() runs in this process rather than in a child process killed when time is up.
+               The time is checked between iterations, so the search stops within one iteration of maxTimeSec,
+               and the tree (self.root) and self.searchStats are kept.
     '''
     self.selectionPolicy = selectionPolicy
     self.expansionPolicy = expansionPolicy # function that returns a seq of actions
+    # Expansion policies keeping only the candidate cells (such as NeighborhoodExpansion) need the states
+    # of the tree to track them: the root is then a copy of the searched state that does, see candidateState
+    self.candidateRadius = getattr(expansionPolicy, "candidateRadius", None)
     self.rollOutPolicy = rollOutPolicy
     self.utilitySumFunc = utilitySumFunc
     self.utilityIdx = utilityIdx
+    self.inPlace = inPlace
+    self.reuseTree = reuseTree
+    self.inProcess = inProcess
+    self.root = None
+    # Statistics of the last search in this process: {"iterations", "rootVisits", "seconds"}
+    self.searchStats = {}
   
   def search(self, 
              state:State, 
@@ -85,13 +114,27 @@ class MCTS(Search):
       simPerIter: number of simulation(rollouts) from the chosen node.
       breakTies: Function used to choose an node from multiple equally good node.
     '''
-    self.root = Node(state, None)
-    self.simPerIter = simPerIter()
     maxTime = maxTimeSec()
-    self.timeMax = time.time()+maxTime
-    self.maxIter = maxIteration()
-    self.breakTies = breakTies
+    self.startSearch(state, time.time()+maxTime, maxIteration(), simPerIter(), breakTies)
+
+    if self.inProcess:
+      actions = []
+      self._search(ListQueue(actions), reportInterval=None)
+      action = actions[-1] if actions else None
+    else:
+      action = self.searchInChildProcess(maxTime)
+    
+    # If the search doesn't give any action, choose the first available action as the default
+    if not action:
+      action = self.expansionPolicy(self.root.state)[0]
+      print("Fail to search for an action - return the first possible action found.")
+    #print("Player take", state.getCurrentPlayerSign(), " action ", action)
+    return action
 
+  def searchInChildProcess(self, maxTime:float)->Optional[Action]:
+    '''
+    Returns the best action found by a child process searching for maxTime seconds.
+    '''
     # Spawn a process to IDS for an action
     # Kill the process when time is up and return the latest action found
     with Manager() as manager:
@@ -107,44 +150,119 @@ class MCTS(Search):
       # Get the latest chosen action
       action = None
       while not q.empty(): action = q.get()
-    
-    # If the search doesn't give any action, choose the first available action as the default
-    if not action:
-      action = self.expansionPolicy(state)[0]
-      print("Fail to search for an action - return the first possible action found.")
-    #print("Player take", state.getCurrentPlayerSign(), " action ", action)
     return action
 
-  def _search(self, queueOfActions):
+  def searchUntil(self, 
+                  state:State, 
+                  endTime:float, 
+                  queueOfActions, 
+                  maxIteration:int=1000000, 
+                  simPerIter:int=1, 
+                  breakTies:Callable[[List[Action]],Action]=random.choice,
+                  reportInterval:float=0.05
+                  )->None:
+    '''
+    Search in this process until `endTime` (a time.time()) or maxIteration iterations,
+    putting the best action in queueOfActions, which only needs a put() method, every reportInterval seconds
+    and at the end. Reporting after every iteration would cost about as much as the iterations themselves
+    when queueOfActions is a pipe to another process.
+    '''
+    self.startSearch(state, endTime, maxIteration, simPerIter, breakTies)
+    self._search(queueOfActions, reportInterval)
+
+  def workerRequest(self, 
+                    maxIteration:Callable=(lambda: 1000000),
+                    maxTimeSec:Callable=(lambda: 1000),
+                    simPerIter:Callable=(lambda:1),
+                    )->Tuple[float, Dict]:
+    '''
+    Returns the time limit of search(state, maxIteration, maxTimeSec, simPerIter) and the arguments of the matching
+    searchUntil(), for a workers.SearchWorker running this agent. The worker breaks ties with random.choice.
+    '''
+    return maxTimeSec(), {"maxIteration": maxIteration(), "simPerIter": simPerIter()}
+
+  def startSearch(self, state:State, timeMax:float, maxIter:int, simPerIter:int, breakTies:Callable[[List[Action]],Action])->None:
+    '''
+    Set up the root and the limits of a search.
+    With self.reuseTree, the subtree of the previous search rooted at `state` becomes the root if there is one.
+    '''
+    root = self.findSubtree(state) if self.reuseTree and self.root else None
+    # A kept tree must not follow the caller advancing `state` with makeMove() after the search
+    rootState = candidateState(state, self.candidateRadius, toCopy=self.reuseTree)
+    if root:
+      root.parent, root.action, root.state = None, None, rootState
+    self.root = root or Node(rootState, None)
+    # The state that is advanced and reverted in place while walking the tree
+    self.state = rootState.clone() if self.inPlace else None
+    self.movesMade = 0
+    self.simPerIter = simPerIter
+    self.timeMax = timeMax
+    self.maxIter = maxIter
+    self.breakTies = breakTies
+
+  def findSubtree(self, state:State, maxPlies:int=2)->Optional[Node]:
+    '''
+    Returns the node of the current tree whose state equals `state`, searching at most maxPlies below the root.
+    Returns None if there is none.
+    '''
+    walkState = self.root.state.clone() if self.inPlace else None
+    return self._findSubtree(self.root, state, walkState, maxPlies)
+
+  def _findSubtree(self, node:Node, state:State, walkState:Optional[State], pliesLeft:int)->Optional[Node]:
+    '''
+    walkState: if self.inPlace, a mutable state at `node`, advanced and reverted while walking the tree
+    '''
+    if (walkState if self.inPlace else node.state)==state: return node
+    if pliesLeft==0: return None
+    for child in node.children.values():
+      if self.inPlace: walkState.makeMove(child.action)
+      found = self._findSubtree(child, state, walkState, pliesLeft-1)
+      if self.inPlace: walkState.undoMove()
+      if found: return found
+    return None
+
+  def _search(self, queueOfActions, reportInterval:Optional[float]=0):
+    '''
+    reportInterval: the seconds between two puts of the best action in queueOfActions. With 0 it is put
+                    after every iteration, as a process that may be killed has to; with None only at the end.
+                    Otherwise it is put at most every reportInterval seconds, and at the end.
+    '''
+    startTime = now = time.time()
+    nextReport = startTime+reportInterval if reportInterval is not None else float('inf')
     # Loop while have remaining iterations or time
-    iterCnt = 0
-    while iterCnt<self.maxIter and time.time()<self.timeMax:
+    iterCnt = reportedIter = 0
+    while iterCnt<self.maxIter and now<self.timeMax:
       self.oneIteration()
       iterCnt+=1
-
-      ########## Select the Best Action in this iteration #######
-      ########## Select the best action based on its expected utilities ##########
-      if not self.root.children: continue
-      bestExpectedUtilities, bestActions = float('-inf'), []
-      epsilon = 0.00001 # Prevent numeric overflow
-      # The sequence of action follows the expansion policy used
-      for action, child in self.root.children.items():
-        if not child.utilities:
-          childUtilities=0
-        else:
-          childUtilities = sum([child.utilities[idx] for idx in self.utilityIdx]) if self.utilityIdx else sum(child.utilities)
-
-        expectedUtilities = childUtilities/(child.numVisits+epsilon)
-        if expectedUtilities>bestExpectedUtilities:
-          bestActions = [action]
-          bestExpectedUtilities = expectedUtilities
-        elif expectedUtilities==bestExpectedUtilities:
-          bestActions.append(action)
-      action = self.breakTies(bestActions)
-      queueOfActions.put(action)
-      ####### End Selecting the Best Action in this iteration #######
+      now = time.time()
+      if now>=nextReport and self.root.children:
+        queueOfActions.put(self.bestAction())
+        reportedIter, nextReport = iterCnt, now+reportInterval
+    if reportedIter!=iterCnt and self.root.children: queueOfActions.put(self.bestAction())
+    self.searchStats = {"iterations": iterCnt, "rootVisits": self.root.numVisits, "seconds": time.time()-startTime}
     # Nothing to return, just end the execution
     return 
+
+  def bestAction(self)->Action:
+    '''
+    Select the best action of the root based on its expected utilities
+    '''
+    bestExpectedUtilities, bestActions = float('-inf'), []
+    epsilon = 0.00001 # Prevent numeric overflow
+    # The sequence of action follows the expansion policy used
+    for action, child in self.root.children.items():
+      if not child.utilities:
+        childUtilities=0
+      else:
+        childUtilities = sum([child.utilities[idx] for idx in self.utilityIdx]) if self.utilityIdx else sum(child.utilities)
+
+      expectedUtilities = childUtilities/(child.numVisits+epsilon)
+      if expectedUtilities>bestExpectedUtilities:
+        bestActions = [action]
+        bestExpectedUtilities = expectedUtilities
+      elif expectedUtilities==bestExpectedUtilities:
+        bestActions.append(action)
+    return self.breakTies(bestActions)
   
   def oneIteration (self)->None:
     '''
@@ -154,11 +272,32 @@ class MCTS(Search):
     '''
     node = self.selection()
     # If the node was visited, and expandable (not terminal)
-    if node.numVisits>0 and not node.state.isTerminal():
+    if node.numVisits>0 and not self.getState(node).isTerminal():
       node = self.expansion(node)
     for i in range(self.simPerIter):
       utility = self.simulation(node)
       self.backpropagation(node, utility, self.utilitySumFunc)
+    # Walk the mutable state back to the root
+    if self.inPlace:
+      for _ in range(self.movesMade): self.state.undoMove()
+      self.movesMade = 0
+
+  def getState(self, node:Node)->State:
+    '''
+    Returns the state of a node.
+    If self.inPlace, it is the mutable state, which is expected to be at `node` already.
+    '''
+    return self.state if self.inPlace else node.state
+
+  def moveTo(self, node:Node)->Node:
+    '''
+    If self.inPlace, advance the mutable state from the node's parent to the node.
+    Returns the node.
+    '''
+    if self.inPlace:
+      self.state.makeMove(node.action)
+      self.movesMade+=1
+    return node
   
   def selection(self)->Node:
     '''
@@ -168,8 +307,8 @@ class MCTS(Search):
     # Select a leaf node starting from the root node
     node = self.root
     depth = 0
-    while not node.isLeaf():
-      node = self.selectionPolicy(node, depth)
+    while not node.isLeaf(self.getState(node)):
+      node = self.moveTo(self.selectionPolicy(node, depth))
       depth+=1
     return node
   
@@ -180,20 +319,20 @@ class MCTS(Search):
     Returns the first children node.
     '''
     # Fully expand the tree ahead of time
-    actions = self.expansionPolicy(node.state)
+    actions = self.expansionPolicy(self.getState(node))
     for action in actions:
       # Add a new state to the tree
-      stateAfterAction = node.state.takeAction(action)
-      newNode = Node(stateAfterAction, node)
+      stateAfterAction = None if self.inPlace else node.state.takeAction(action)
+      newNode = Node(stateAfterAction, node, action)
       node.children[action] = newNode
     # Choose the firstAction newNode to return
-    return node.children[actions[0]]
+    return self.moveTo(node.children[actions[0]])
   
   def simulation(self, node:Node)->Any:
     '''
     Returns the rewards received from this simulation
     '''
-    return self.rollOutPolicy(node.state)
+    return self.rollOutPolicy(self.getState(node))
   
   def backpropagation(self, node:Node, utility:Any, utilitySumFunc:Callable=sum)->None:
     '''
@@ -223,9 +362,9 @@ def randomRollout(state:State)->Any:
   until the terminal state. 
   Returns the terminal state utility.
   '''
-  # Deep copy to perform takeAction that doesnt preserve state
+  # Copy to perform takeAction that doesnt preserve state
   # This is done to speed up rollout
-  state = pickle.loads(pickle.dumps(state))
+  state = state.clone()
   while not state.isTerminal():
     actions = state.getActions()
     '''
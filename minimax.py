@@ -1,8 +1,56 @@
 import time
+import math
+import mmap
+import os
+import random
 from collections import defaultdict
-from multiprocessing import Process, Manager
-from typing import Callable, Dict, Optional, List, Tuple
-from prototype import Search, State, Action
+from multiprocessing import Process, Manager, RawArray
+from typing import Callable, Dict, Optional, List, Tuple, Hashable, Union
+from prototype import Search, State, Action, SearchTimeout, ListQueue
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from geometry import NeighborhoodExpansion, candidateActions, candidateState
+
+def positionKey(state:State)->Hashable:
+  '''
+  Returns the key used to store a state in the cache.
+  States exposing an int `zobristKey` (such as MNK) are keyed by it, so that a cache probe
+  hashes an int instead of the whole state. Other states are used as their own key.
+  '''
+  return getattr(state, "zobristKey", state)
+
+def canonicalPositionKey(state:State)->Hashable:
+  '''
+  Returns a key shared by all the symmetric images of a state (see MNK.getCanonicalKey),
+  so that a value cached for one of them is found for the others.
+  '''
+  return state.getCanonicalKey()[0]
+
+class Cache(defaultdict):
+  '''
+  A cache of state values, in the form of a dictionary with key of (self.positionKey(state), depth).
+  positionKey: returns the key of a state. Expansion policies that probe the cache should use it too.
+  '''
+  def __init__(self, positionKey:Callable[[State], Hashable]=positionKey):
+    super().__init__(lambda:("__eq__", 0))
+    self.positionKey = positionKey
+    # {positionKey: flat index of the best action found}, whatever the depth. See Minimax.toOrderHashMove
+    self.bestMoves = {}
+
+  def bestMove(self, key:Hashable)->int:
+    '''
+    Returns the best move stored for `key`, -1 if there is none.
+    '''
+    return self.bestMoves.get(key, -1)
+
+  def cachedValue(self, state:State, depth:int)->float:
+    '''
+    Returns the value cached for a state at `depth`, 0 if there is none.
+    '''
+    return self.get((self.positionKey(state), depth), ("__eq__", 0))[1]
+
+# Bound flags of the transposition table, by the flags of Cache
+TABLE_FLAGS = {"__eq__":EXACT, "__geq__":LOWER, "__leq__":UPPER}
+CACHE_FLAGS = {flag:name for name, flag in TABLE_FLAGS.items()}
 
 '''
 Minimax Search with AlphaBeta Pruning, and Memoization
@@ -14,6 +62,12 @@ class Minimax(Search):
                 expansionPolicy:Callable[[State, int, Dict], List[Action]]=lambda state, depth, cache: state.getActions(),
                 toCache:bool=False,
                 toAlphaBetaPrune:bool=True,
+                inPlace:bool=False,
+                toCanonicalize:bool=False,
+                cacheSize:Optional[int]=None,
+                toOrderHashMove:bool=False,
+                toPVS:bool=False,
+                toReuseCache:bool=False,
                 ):
     '''
     depth: maximum depth that the minimax tree should evaluate. At depth `depth` the `evaluationFunction` is called to evaluate the state.
@@ -24,34 +78,137 @@ class Minimax(Search):
                      from a minimizer or maximizer. The third argument is `cache`, which could be used in sequencing actions.
     toCache: whether to cache state values. The cached value might be an approximate only if alpha-beta pruning is used.
     toAlphaBetaPrune: whether to use alpha-beta pruning. Pruning will likely be faster if use together with a cache.
+    inPlace: whether to walk the tree on one mutable state with `state.makeMove(action)`/`state.undoMove()`
+             instead of copying the state with `state.takeAction(action)` at every edge.
+             The state should expose a `zobristKey` if it is used together with the cache (see positionKey).
+    toCanonicalize: whether to key the cache on canonical positions (see canonicalPositionKey), so that symmetric
+                    positions share their cached values. The state should implement `getCanonicalKey()`.
+                    Values are shared exactly only if the evaluationFunction is symmetric too.
+    cacheSize: if given, the cache is a TranspositionTable of `cacheSize` buckets instead of an unbounded Cache.
+               Its entries are keyed by the remaining depth of the search rather than by the depth of the node,
+               so positions reached at different plies share them. The state should expose an int `zobristKey`.
+    toOrderHashMove: whether to record the best action of every cached node, and to try it first when the node is
+                     searched again (e.g. by the next iteration of MinimaxIDS). The other actions keep the order of
+                     the expansionPolicy, so a cheap static policy such as linearExpansion can replace cacheExpansion,
+                     which builds every child state to order them. Requires toCache, and the state to implement
+                     `getAction(index)` and actions with a flat `index`, as MNK does.
+
+    toPVS: whether to use principal variation search: at every node, the first action is searched with the full
+           (alpha, beta) window, and the others with a null window around alpha (around beta at a minimizer),
+           which only tells whether they beat the first one. An action is searched again with (alpha, beta)
+           only if it does. It pays off when the first action is usually the best, e.g. with toOrderHashMove
+           or KillerHistoryExpansion. Requires toAlphaBetaPrune.
+    toReuseCache: whether to keep the cache from one search to the next (e.g. from one move of a game to the next)
+                  instead of emptying it when a search resets the cache. The entries of the previous searches are
+                  only aged (see TranspositionTable.newSearch), so the next search starts warm. Requires cacheSize:
+                  a Cache is keyed by the depth of the node, which no longer matches once the root advances.
+                  The cached values are those of the player to move at the root, so the cache is emptied anyway
+                  if it changes; the state should implement `getCurrentPlayerSign()`.
+                  The cache only carries over if the searches run in this process (MinimaxIDS `inProcess`,
+                  workers.SearchWorker) or share it (MinimaxLazySMP).
+
+    If the expansionPolicy has a `recordCutoff(action, depth, remainingDepth)` method, it is called with every
+    action causing an alpha-beta cutoff (see KillerHistoryExpansion).
     '''
     self.depth = depth
     self.evaluationFunction = evaluationFunction
     self.expansionPolicy = expansionPolicy
+    # Expansion policies that learn from the search (such as KillerHistoryExpansion) are told about every cutoff
+    self.recordCutoff = getattr(expansionPolicy, "recordCutoff", None)
+    # Expansion policies keeping only the candidate cells (such as NeighborhoodExpansion) need the searched
+    # states to track them: the search then runs on a copy of the root that does, see candidateState
+    self.candidateRadius = getattr(expansionPolicy, "candidateRadius", None)
     self.toCache = toCache
-    self.cache = defaultdict(lambda:("__eq__", 0)) if toCache else None
+    self.toCanonicalize = toCanonicalize
+    self.cacheSize = cacheSize
+    self.toOrderHashMove = toOrderHashMove
+    self.cache = self.newCache() if toCache else None
     self.toAlphaBetaPrune = toAlphaBetaPrune
+    self.inPlace = inPlace
+    if toPVS and not toAlphaBetaPrune:
+      raise Exception("Principal variation search requires alpha-beta pruning")
+    self.toPVS = toPVS
+    if toReuseCache and not (toCache and cacheSize):
+      raise Exception("Reusing the cache across searches requires a TranspositionTable (toCache and cacheSize)")
+    self.toReuseCache = toReuseCache
+    # The player to move at the root of the previous search, if self.toReuseCache
+    self.rootPlayer = None
+    # Value of the root found by the last search()
+    self.rootValue = None
+    # Number of edges walked so far, see applyAction
+    self.nodes = 0
+    # If set, a time.time() after which the search raises SearchTimeout, and a number of edges
+    # (counted by self.nodes) after which it does. Both are checked every checkInterval edges,
+    # so the search overruns them by at most that many edges. See search().
+    self.deadline = None
+    self.nodeLimit = None
+    self.checkInterval = 256
+    # Number of moves made on the searched state by applyAction and not undone yet, if self.inPlace
+    self.movesMade = 0
 
-  def search(self, state:State, resetCache:bool=True)->Action:
+  def newCache(self)->Union[Cache, TranspositionTable]:
+    '''
+    Returns an empty cache keyed according to self.toCanonicalize, bounded if self.cacheSize is set
+    '''
+    key = canonicalPositionKey if self.toCanonicalize else positionKey
+    if self.cacheSize: return TranspositionTable(self.cacheSize, key)
+    return Cache(key)
+
+  def resetCache(self, state:State)->None:
+    '''
+    Empty the cache before searching `state`. If self.toReuseCache, only start a new generation of its entries,
+    unless the player to move differs from the previous root's: the values are those of the root player.
+    '''
+    rootPlayer = state.getCurrentPlayerSign() if self.toReuseCache else None
+    if self.toReuseCache and rootPlayer==self.rootPlayer: self.cache.newSearch()
+    else: self.cache = self.newCache()
+    self.rootPlayer = rootPlayer
+
+  def search(self, state:State, resetCache:bool=True, rootWindow:Optional[Tuple[float, float]]=None)->Action:
     '''
     If applicable, reset the cache to empty whenever a new search is called.
     This is done to save memory
+    rootWindow: the (alpha, beta) window to search the root with, when pruning. Defaults to (-inf, inf).
+                With a narrower window the root value (self.rootValue) is only exact if it falls inside it,
+                see MinimaxIDS `aspirationWindow`.
+
+    If self.deadline or self.nodeLimit is passed, the search raises SearchTimeout, after undoing the moves it made
+    on `state` if self.inPlace. The cache keeps only the values of the subtrees searched to the end, so it
+    stays valid.
     '''
-    if resetCache and self.toCache: self.cache = defaultdict(lambda:("__eq__", 0))
-    if self.toAlphaBetaPrune: rootAlpha, rootBeta = float('-inf'), float('inf')
+    state = candidateState(state, self.candidateRadius)
+    if resetCache and self.toCache: self.resetCache(state)
+    self.movesMade = 0
+    try:
+      return self.searchRoot(state, rootWindow)
+    except SearchTimeout:
+      for _ in range(self.movesMade): state.undoMove()
+      self.movesMade = 0
+      raise
+
+  def searchRoot(self, state:State, rootWindow:Optional[Tuple[float, float]])->Action:
+    if self.toAlphaBetaPrune: rootAlpha, rootBeta = rootWindow if rootWindow else (float('-inf'), float('inf'))
     if not self.toAlphaBetaPrune: rootAlpha, rootBeta = None, None
+    windowAlpha, windowBeta = rootAlpha, rootBeta
     
     values = []
 
     value = float('-inf')
-    actions = self.expansionPolicy(state, 0, self.cache)
-    for action in actions:
-      tempValue = self.minValue(state.takeAction(action), 1, rootAlpha, rootBeta)
+    actions = self.orderActions(state, 0)
+    for index, action in enumerate(actions):
+      tempValue = self.searchChild(self.minValue, self.applyAction(state, action), 1, rootAlpha, rootBeta, index==0)
+      if self.inPlace: self.undoAction(state)
       values.append(tempValue)
       value = max(value, tempValue)
-      if rootAlpha: rootAlpha = max(rootAlpha, value)
+      if rootAlpha is not None:
+        # Fail high: the root value is at least rootBeta
+        if value>=rootBeta: break
+        rootAlpha = max(rootAlpha, value)
     
+    self.rootValue = value
     bestIndices=[index for index in range(len(values)) if values[index] == value]
+    # Remember the best root action for the next search
+    if self.toCache and self.toOrderHashMove: self.storeCache(state, 0, windowAlpha, windowBeta, value, actions[bestIndices[0]])
     return actions[bestIndices[0]] # The first action
 
   def maxValue(self, state:State, depth:int, alpha:Optional[float], beta:Optional[float])->float:
@@ -61,18 +218,22 @@ class Minimax(Search):
     if self.toCache:
       alpha, beta, value = self.readCache(state, depth, alpha, beta)
       alphaCopy, betaCopy = alpha, beta
-      if value: return value
+      if value is not None: return value
 
-    value = float("-inf")
-    actions = self.expansionPolicy(state, depth, self.cache)
-    for action in actions:
-      value = max(value, self.minValue(state.takeAction(action), depth+1, alpha, beta))
-      if alpha and beta:
-        if value >= beta: break
+    value, bestAction = float("-inf"), None
+    actions = self.orderActions(state, depth)
+    for index, action in enumerate(actions):
+      childValue = self.searchChild(self.minValue, self.applyAction(state, action), depth+1, alpha, beta, index==0)
+      if self.inPlace: self.undoAction(state)
+      if bestAction is None or childValue>value: value, bestAction = childValue, action
+      if alpha is not None and beta is not None:
+        if value >= beta:
+          if self.recordCutoff: self.recordCutoff(action, depth, self.depth-depth)
+          break
         alpha = max(alpha, value)
     
     # Store or Update a state's value
-    if self.toCache: self.storeCache(state, depth, alphaCopy, betaCopy, value)
+    if self.toCache: self.storeCache(state, depth, alphaCopy, betaCopy, value, bestAction)
     return value
       
   def minValue(self, state:State, depth:int, alpha:Optional[float], beta:Optional[float])->float:
@@ -82,46 +243,150 @@ class Minimax(Search):
     if self.toCache:
       alpha, beta, value = self.readCache(state, depth, alpha, beta)
       alphaCopy, betaCopy = alpha, beta
-      if value: return value
+      if value is not None: return value
 
-    value = float("inf")
-    actions = self.expansionPolicy(state, depth, self.cache)
-    for action in actions:
-      value = min(value, self.maxValue(state.takeAction(action), depth+1, alpha, beta))
-      if alpha and beta:
-        if value <= alpha: break
+    value, bestAction = float("inf"), None
+    actions = self.orderActions(state, depth)
+    for index, action in enumerate(actions):
+      childValue = self.searchChild(self.maxValue, self.applyAction(state, action), depth+1, alpha, beta, index==0)
+      if self.inPlace: self.undoAction(state)
+      if bestAction is None or childValue<value: value, bestAction = childValue, action
+      if alpha is not None and beta is not None:
+        if value <= alpha:
+          if self.recordCutoff: self.recordCutoff(action, depth, self.depth-depth)
+          break
         beta = min(beta, value)
     
     # Store or Update a state's value
-    if self.toCache: self.storeCache(state, depth, alphaCopy, betaCopy, value)
+    if self.toCache: self.storeCache(state, depth, alphaCopy, betaCopy, value, bestAction)
     return value
 
-  def storeCache(self, state:State, depth:int, alpha:Optional[float], beta:Optional[float], value:float)->None:
+  def searchChild(self, valueFunction:Callable, state:State, depth:int, alpha:Optional[float], beta:Optional[float], isFirst:bool)->float:
+    '''
+    Returns valueFunction(state, depth, alpha, beta), the value of a child state.
+    valueFunction: self.minValue for the children of a maximizer, self.maxValue for those of a minimizer
+    isFirst: whether it is the first child searched. With self.toPVS the other children are first
+             searched with a null window, and searched again only if their value falls within (alpha, beta).
+    '''
+    if self.toPVS and not isFirst and alpha is not None and beta is not None:
+      if valueFunction==self.minValue: nullWindow = (alpha, math.nextafter(alpha, math.inf))
+      else: nullWindow = (math.nextafter(beta, -math.inf), beta)
+      value = valueFunction(state, depth, *nullWindow)
+      if not alpha<value<beta: return value
+    return valueFunction(state, depth, alpha, beta)
+
+  def orderActions(self, state:State, depth:int)->List[Action]:
+    '''
+    Returns the actions to search from a state, in the order of self.expansionPolicy.
+    If self.toOrderHashMove, the hash move (the best action cached for the state) is moved first.
+    '''
+    actions = self.expansionPolicy(state, depth, self.cache)
+    if self.toOrderHashMove and self.toCache:
+      hashMove = self.hashMove(state)
+      # The membership test also drops a move stored by another position with the same key
+      if hashMove is not None and hashMove in actions:
+        actions = [hashMove]+[action for action in actions if action!=hashMove]
+    return actions
+
+  def hashMove(self, state:State)->Optional[Action]:
+    '''
+    Returns the best action cached for a state, None if there is none.
+    '''
+    key, transform = self.tableKey(state)
+    index = self.cache.bestMove(key)
+    if index<0: return None
+    action = state.getAction(index)
+    if self.toCanonicalize: action = state.transformAction(action, transform, inverse=True)
+    return action
+
+  def moveIndex(self, state:State, action:Optional[Action], transform:int)->int:
+    '''
+    Returns the flat index of `action` as stored in the cache: in the orientation
+    of the canonical position if self.toCanonicalize, -1 if `action` is None.
+    '''
+    if action is None: return -1
+    return (state.transformAction(action, transform) if self.toCanonicalize else action).index
+
+  def applyAction(self, state:State, action:Action)->State:
+    '''
+    Returns the state after taking `action`.
+    If self.inPlace, `state` itself is advanced and the caller has to `state.undoMove()` afterwards.
+    '''
+    self.nodes+=1
+    if self.nodes%self.checkInterval==0: self.checkLimits()
+    if self.inPlace:
+      state.makeMove(action)
+      self.movesMade+=1
+      return state
+    return state.takeAction(action)
+
+  def undoAction(self, state:State)->None:
+    '''
+    Revert the last applyAction() on `state`, if self.inPlace
+    '''
+    state.undoMove()
+    self.movesMade-=1
+
+  def checkLimits(self)->None:
+    '''
+    Raise SearchTimeout if self.deadline or self.nodeLimit is passed
+    '''
+    if (self.deadline is not None and time.time()>self.deadline) or (self.nodeLimit is not None and self.nodes>=self.nodeLimit):
+      raise SearchTimeout()
+
+  def storeCache(self, state:State, depth:int, alpha:Optional[float], beta:Optional[float], value:float, bestAction:Optional[Action]=None)->None:
     '''
     Store/Update the value of a state into a cache.
-    A cache is in a form of dictionary with key of (state, depth).
+    A cache is in a form of dictionary with key of (self.cache.positionKey(state), depth).
     If no pruning happened (alpha<value<beta), it means the value of the state is exact (not approximate)
       Thus, we store a tuple of ("__eq__", value). The first element serves as a flag that the `value` is exact
     If value<=alpha, then we know that the actual stateValue is less than or equal the approximated `value`.
       Thus, we store ("__leq__", value)
     If value >= beta, then we know that the actual stateValue is greater than or equal the approximated `value`.
       Thus, we store ("__geq__", value)
+    If the cache is a TranspositionTable, the entry is stored under the remaining depth self.depth-depth
+    together with `bestAction`, the action that led to `value`. A Cache records `bestAction` if self.toOrderHashMove.
     '''
-    #depth = 0
-    if not alpha or not beta:
+    if alpha is None or beta is None:
       # No pruning happened
-      self.cache[(state, depth)] = ("__eq__", value)
-      return
-    
+      flag = "__eq__"
     # Pruning might happen -> inaccurate value
-    if value<=alpha:
-      self.cache[(state, depth)] = ("__leq__", value)
+    elif value<=alpha:
+      flag = "__leq__"
     elif alpha<value<beta:
-      self.cache[(state, depth)] = ("__eq__", value)
+      flag = "__eq__"
     elif beta<=value:
-      self.cache[(state, depth)] = ("__geq__", value)
+      flag = "__geq__"
     else:
       raise Exception("Shouldn't get here.")
+
+    key, transform = self.tableKey(state)
+    if isinstance(self.cache, TranspositionTable):
+      self.cache.store(key, TABLE_FLAGS[flag], value, self.depth-depth, self.moveIndex(state, bestAction, transform))
+    else:
+      self.cache[(key, depth)] = (flag, value)
+      if self.toOrderHashMove and bestAction is not None:
+        self.cache.bestMoves[key] = self.moveIndex(state, bestAction, transform)
+
+  def tableKey(self, state:State)->Tuple[Hashable, int]:
+    '''
+    Returns the cache key of a state, and the symmetry transform mapping it to
+    the canonical position the key stands for (0, the identity, unless self.toCanonicalize).
+    '''
+    if self.toCanonicalize: return state.getCanonicalKey()
+    return positionKey(state), 0
+
+  def lookupCache(self, state:State, depth:int)->Optional[Tuple[str, float]]:
+    '''
+    Returns the (flag, value) cached for a state at `depth`, or None.
+    From a TranspositionTable, only entries searched at least self.depth-depth deeper are returned.
+    '''
+    if isinstance(self.cache, TranspositionTable):
+      entry = self.cache.probe(self.tableKey(state)[0])
+      if entry is None or entry[2]<self.depth-depth: return None
+      return CACHE_FLAGS[entry[0]], entry[1]
+    key = (self.cache.positionKey(state), depth)
+    return self.cache[key] if key in self.cache else None
   
   def readCache(self, state:State, depth:int, alpha:Optional[float], beta:Optional[float])->Tuple[Optional[float], Optional[float], Optional[float]]:
     '''
@@ -141,23 +406,22 @@ class Minimax(Search):
         c. beta<=cachedValue -> cachedValue has no help. Proceed to search as usual
     4. Similar thing for flag = __geq__
     '''
-    #depth = 0
-    if not alpha or not beta:
-      if (state, depth) in self.cache: 
-        return alpha, beta, self.cache[(state, depth)][1] # second element is the value
+    entry = self.lookupCache(state, depth)
+    if entry is None: return alpha, beta, None
+    flag, value = entry
+    if alpha is None or beta is None:
+      return alpha, beta, value
     
     # Pruning might happen
     # If alpha and beta are provided, return (possibly updated) alpha, beta, and value (if applicable)
     returnValue = None
-    if (state, depth) in self.cache:
-      flag, value = self.cache[(state, depth)]
-      if flag == "__eq__": returnValue = value
-      elif flag == "__leq__":
-        if value <= alpha: returnValue = value
-        elif alpha<value<beta: beta = value
-      elif flag =="__geq__":
-        if beta <= value: returnValue =  value
-        elif alpha<value<beta: alpha = value
+    if flag == "__eq__": returnValue = value
+    elif flag == "__leq__":
+      if value <= alpha: returnValue = value
+      elif alpha<value<beta: beta = value
+    elif flag =="__geq__":
+      if beta <= value: returnValue =  value
+      elif alpha<value<beta: alpha = value
     return alpha, beta, returnValue
 
 '''
@@ -171,11 +435,34 @@ class MinimaxIDS(Minimax):
               evaluationFunction: Callable[[State, int], float], 
               expansionPolicy: Callable[[State, int, Dict], List[Action]]=lambda state, depth, cache: state.getActions(), 
               toCache: bool=False,
-              toAlphaBetaPrune:bool=True,):
+              toAlphaBetaPrune:bool=True,
+              inPlace:bool=False,
+              toCanonicalize:bool=False,
+              cacheSize:Optional[int]=None,
+              toOrderHashMove:bool=False,
+              toPVS:bool=False,
+              aspirationWindow:Optional[float]=None,
+              inProcess:bool=False,
+              toReuseCache:bool=False,):
+    '''
+    aspirationWindow: if given, every iteration after the first searches the root with the window
+                      (previous value-aspirationWindow, previous value+aspirationWindow), and searches
+                      again with the full window only if the root value falls outside it. Requires toAlphaBetaPrune.
+    inProcess: whether search() runs in this process rather than in a child process killed when time is up.
+               The iteration running when time is up is abandoned within self.checkInterval edges (see `deadline`),
+               and the cache, the expansionPolicy statistics and self.searchStats are kept.
+    '''
     # Start Searching until cutoff depth 1
-    super().__init__(1, evaluationFunction, expansionPolicy, toCache, toAlphaBetaPrune)
+    super().__init__(1, evaluationFunction, expansionPolicy, toCache, toAlphaBetaPrune, inPlace, toCanonicalize, cacheSize, toOrderHashMove, toPVS, toReuseCache)
+    if aspirationWindow and not toAlphaBetaPrune:
+      raise Exception("Aspiration windows require alpha-beta pruning")
     self.time = time
     self.maxDepth = maxDepth
+    self.aspirationWindow = aspirationWindow
+    self.inProcess = inProcess
+    # Statistics of the last searchUntil(): {"depth": deepest iteration completed, "value": its root value,
+    # "nodes": edges walked, "seconds": time spent}
+    self.searchStats = {}
   
   def search(self, state: State, resetCache:bool=True)->Action:
     '''
@@ -192,8 +479,26 @@ class MinimaxIDS(Minimax):
     If applicable, reset the cache to empty whenever a new search is called.
     This is done to save memory
     '''
-    if resetCache and self.toCache: self.cache = defaultdict(lambda:("__eq__", 0))
+    if resetCache and self.toCache: self.resetCache(state)
 
+    if self.inProcess:
+      actions = []
+      self.searchUntil(state, time.time() + self.time, ListQueue(actions), resetCache=False)
+      action = actions[-1] if actions else None
+    else:
+      action = self.searchInChildProcess(state)
+    
+    # If the search doesn't give any action, choose the first available action as the default
+    if not action:
+      action = self.expansionPolicy(candidateState(state, self.candidateRadius), 0, self.cache)[0]
+      print("Fail to search for an action - return the first possible action found.")
+    #print("Player take", state.getCurrentPlayerSign(), " action ", action)
+    return action
+
+  def searchInChildProcess(self, state:State)->Optional[Action]:
+    '''
+    Returns the action of the last iteration completed by a child process searching for self.time seconds.
+    '''
     # Spawn a process to IDS for an action
     # Kill the process when time is up and return the latest action found
     with Manager() as manager:
@@ -209,12 +514,6 @@ class MinimaxIDS(Minimax):
       # Get the latest chosen action
       action = None
       while not q.empty(): action = q.get()
-    
-    # If the search doesn't give any action, choose the first available action as the default
-    if not action:
-      action = self.expansionPolicy(state, 0, self.cache)[0]
-      print("Fail to search for an action - return the first possible action found.")
-    #print("Player take", state.getCurrentPlayerSign(), " action ", action)
     return action
 
   def _search(self, state:State, queueOfActions):
@@ -225,15 +524,227 @@ class MinimaxIDS(Minimax):
     queueOfActions: multiprocessing.Manager().Queue()
     It is used to share the action searched to the parent process.
     '''
+    self.searchUntil(state, time.time() + self.time, queueOfActions, resetCache=False)
+    return queueOfActions
+
+  def searchUntil(self, state:State, endTime:float, queueOfActions, resetCache:bool=True)->None:
+    '''
+    Iterative Deepening Search in this process until `endTime` (a time.time()), or until self.maxDepth is searched.
+    The action of every completed iteration is put in queueOfActions, which only needs a put() method.
+    The iteration running at endTime is abandoned within self.checkInterval edges (see `deadline`).
+    '''
+    state = candidateState(state, self.candidateRadius)
+    if resetCache and self.toCache: self.resetCache(state)
+    startTime = time.time()
     # Start Searching until cutoff depth 1
     self.depth = 1
+    self.rootValue = None
+    self.nodes = 0
+    self.deadline = endTime
+    self.searchStats = {"depth": 0, "value": None, "nodes": 0, "seconds": 0}
+    try:
+      while time.time() < endTime and self.depth<=self.maxDepth:
+        action = self.searchDepth(state)
+        queueOfActions.put(action)
+        self.searchStats.update(depth=self.depth, value=self.rootValue)
+        #print("Finish Depth: ", self.depth, " action: ", action)
+        self.depth+=1
+    except SearchTimeout:
+      # The last iteration is abandoned: self.rootValue is that of the last completed one
+      self.rootValue = self.searchStats["value"]
+    finally:
+      self.deadline = None
+      self.searchStats.update(nodes=self.nodes, seconds=time.time()-startTime)
+
+  def workerRequest(self, resetCache:bool=True)->Tuple[float, Dict]:
+    '''
+    Returns the time limit of search(state, resetCache) and the arguments of the matching searchUntil(),
+    for a workers.SearchWorker running this agent
+    '''
+    return self.time, {"resetCache": resetCache}
+
+  def searchDepth(self, state:State)->Action:
+    '''
+    One iteration of the IDS: search to self.depth, reusing the cache of the previous iterations.
+    With an aspiration window, the root is first searched around the previous iteration's value.
+    '''
+    previousValue = self.rootValue
+    if self.aspirationWindow and previousValue is not None and math.isfinite(previousValue):
+      window = (previousValue-self.aspirationWindow, previousValue+self.aspirationWindow)
+      action = super().search(state, resetCache=False, rootWindow=window)
+      if window[0]<self.rootValue<window[1]: return action
+      # Fail low or fail high: the window did not hold the root value
+    return super().search(state, resetCache=False) # maintain the cache over iterations
+
+
+'''
+Iterative Deepening Search with MTD(f).
+Every iteration finds the root value with a series of null-window searches, starting from the value
+of the previous iteration: each search tells whether the root value is below or above the guess,
+and the cache keeps the bounds found, so the next searches revisit most nodes for free.
+It needs a TranspositionTable (cacheSize), which keeps its bounds exact across iterations:
+a Cache is keyed by the depth of the node, so its bounds from a shallower iteration would be taken as exact.
+'''
+class MinimaxMTDF(MinimaxIDS):
+  def __init__(self, 
+              time:int,
+              maxDepth:int,
+              evaluationFunction: Callable[[State, int], float], 
+              expansionPolicy: Callable[[State, int, Dict], List[Action]]=lambda state, depth, cache: state.getActions(), 
+              inPlace:bool=False,
+              toCanonicalize:bool=False,
+              cacheSize:int=1<<20,
+              toOrderHashMove:bool=False,
+              inProcess:bool=False,
+              toReuseCache:bool=False,):
+    '''
+    cacheSize: number of buckets of the TranspositionTable. It is required.
+    The other arguments are those of MinimaxIDS; the cache and alpha-beta pruning are always on.
+    '''
+    if not cacheSize:
+      raise Exception("MTD(f) requires a TranspositionTable (cacheSize)")
+    super().__init__(time, maxDepth, evaluationFunction, expansionPolicy, True, True, inPlace, toCanonicalize, cacheSize, toOrderHashMove, inProcess=inProcess, toReuseCache=toReuseCache)
+    # Number of null-window searches of the last iteration
+    self.numPasses = 0
+
+  def searchDepth(self, state:State)->Action:
+    '''
+    One iteration of the IDS: converge on the root value at self.depth with null-window searches.
+    The first guess is the previous iteration's value, or the evaluation of the root for the first one.
+    '''
+    guess = self.rootValue
+    if guess is None or not math.isfinite(guess): guess = self.evaluationFunction(state, 0)
+    lower, upper = float('-inf'), float('inf')
+    action, bestAction = None, None
+    self.numPasses = 0
+    while lower<upper:
+      # Test whether the root value is at least beta
+      beta = guess if guess>lower else math.nextafter(lower, math.inf)
+      action = Minimax.search(self, state, resetCache=False, rootWindow=(math.nextafter(beta, -math.inf), beta))
+      self.numPasses+=1
+      guess = self.rootValue
+      if guess<beta: upper = guess
+      else:
+        lower = guess
+        # The root stopped at an action reaching beta
+        bestAction = action
+    self.rootValue = lower
+    return bestAction if bestAction is not None else action
+
+
+'''
+Lazy SMP: iterative deepening Minimax run by `numWorkers` processes on the same root,
+sharing one transposition table in memory.
+The workers do not split the tree between them. They search it all, each in a slightly different order
+(half of them start one depth deeper, and the helpers shuffle the root actions after the hash move),
+and the bounds and best moves any of them stores speed up the others.
+When `time` is up, the action of the deepest iteration completed by any worker is returned.
+The table is an anonymous shared mmap inherited by the forked workers, so sharing needs the "fork"
+start method of multiprocessing; with another start method every worker searches with a private copy.
+'''
+class MinimaxLazySMP(MinimaxIDS):
+  def __init__(self, 
+              time:int,
+              maxDepth:int,
+              evaluationFunction: Callable[[State, int], float], 
+              expansionPolicy: Callable[[State, int, Dict], List[Action]]=lambda state, depth, cache: state.getActions(), 
+              numWorkers:Optional[int]=None,
+              inPlace:bool=False,
+              toCanonicalize:bool=False,
+              cacheSize:int=1<<20,
+              toOrderHashMove:bool=True,
+              toPVS:bool=False,
+              aspirationWindow:Optional[float]=None,
+              toReuseCache:bool=False,):
+    '''
+    numWorkers: number of search processes. Defaults to the number of CPUs.
+    cacheSize: number of buckets of the shared TranspositionTable
+    The other arguments are those of MinimaxIDS; the cache is always on.
+    '''
+    self.numWorkers = numWorkers or os.cpu_count()
+    # Index of the worker running this copy of the agent, 0 in the parent
+    self.workerIndex = 0
+    # Per worker: edges walked in the last search, updated every 1024 edges. See applyAction
+    self.nodeCounts = None
+    self.sharedBuffer = None
+    super().__init__(time, maxDepth, evaluationFunction, expansionPolicy, True, True, inPlace, toCanonicalize, cacheSize, toOrderHashMove, toPVS, aspirationWindow, toReuseCache=toReuseCache)
+    # Statistics of the last search: {"depth": deepest iteration completed, "nodes": edges walked by all workers}
+    self.searchStats = {}
+
+  def newCache(self)->TranspositionTable:
+    '''
+    Returns the shared table, emptied
+    '''
+    if self.sharedBuffer is None:
+      self.sharedBuffer = mmap.mmap(-1, TranspositionTable.bufferSize(self.cacheSize))
+    table = TranspositionTable(self.cacheSize, canonicalPositionKey if self.toCanonicalize else positionKey, self.sharedBuffer)
+    table.clear()
+    return table
+
+  def search(self, state:State, resetCache:bool=True)->Action:
+    '''
+    Search with self.numWorkers processes for self.time seconds, and return the action
+    of the deepest iteration completed. The first possible action is returned if none completed.
+    '''
+    state = candidateState(state, self.candidateRadius)
+    if resetCache: self.resetCache(state)
+    self.nodeCounts = RawArray('q', self.numWorkers)
+    deadline = time.time()+self.time
+    with Manager() as manager:
+      q = manager.Queue()
+      workers = [Process(target=self._workerSearch, args=(state, q, workerIndex)) for workerIndex in range(self.numWorkers)]
+      for p in workers: p.start()
+      for p in workers: p.join(max(0, deadline-time.time()))
+      for p in workers:
+        if p.is_alive():
+          p.terminate()
+          p.join()
+      # (depth, -workerIndex, action): prefer the deepest iteration, then the lowest worker index
+      results = []
+      while not q.empty(): results.append(q.get())
+    self.searchStats = {"depth": max(results)[0] if results else 0, "nodes": sum(self.nodeCounts)}
+    if not results:
+      print("Fail to search for an action - return the first possible action found.")
+      return self.expansionPolicy(state, 0, self.cache)[0]
+    return max(results, key=lambda result: result[:2])[2]
+
+  def _workerSearch(self, state:State, queueOfResults, workerIndex:int)->None:
+    '''
+    Iterative deepening in one worker process. Each completed iteration puts (depth, -workerIndex, action) in the queue.
+    '''
+    self.workerIndex = workerIndex
+    self.random = random.Random(workerIndex)
+    self.nodes = 0
+    self.rootValue = None
     endTime = time.time() + self.time
+    self.depth = 1 + workerIndex%2
     while time.time() < endTime and self.depth<=self.maxDepth:
-      action= super().search(state, resetCache=False) # maintain the cache over iterations
-      queueOfActions.put(action)
-      #print("Finish Depth: ", self.depth, " action: ", action)
+      action = self.searchDepth(state)
+      queueOfResults.put((self.depth, -workerIndex, action))
       self.depth+=1
-    return queueOfActions
+    self.nodeCounts[workerIndex] = self.nodes
+
+  def orderActions(self, state:State, depth:int)->List[Action]:
+    '''
+    As Minimax.orderActions, except that helper workers shuffle the root actions after the first one
+    '''
+    actions = super().orderActions(state, depth)
+    if depth==0 and self.workerIndex:
+      rest = actions[1:]
+      self.random.shuffle(rest)
+      actions = actions[:1]+rest
+    return actions
+
+  def applyAction(self, state:State, action:Action)->State:
+    if self.nodes&1023==0 and self.nodeCounts is not None: self.nodeCounts[self.workerIndex] = self.nodes
+    return super().applyAction(state, action)
+
+  def __getstate__(self)->dict:
+    # An mmap cannot be pickled: a pickled agent searches with a private copy of the table
+    state = self.__dict__.copy()
+    state["sharedBuffer"] = None
+    state["nodeCounts"] = None
+    return state
 
 
 def linearExpansion(state:State, depth:int, cache:Dict)->List[Action]:
@@ -246,6 +757,7 @@ def cacheExpansion(state:State, depth:int, cache:Dict)->List[Action]:
   '''
   Return a list of actions sorted based on the cache.
   The actions is sorted such that it increases the chance of pruning in AlphaBeta Pruning.
+  Every child state is built to look it up, so Minimax(toOrderHashMove=True) with linearExpansion is a cheaper alternative.
   It assumes that if `depth` is an odd number, then this function is called from a minimizer,
   thus actions are sorted ascendingly using the resulting states value as the key.
   The reverse is true for an even number `depth`.
@@ -257,13 +769,54 @@ def cacheExpansion(state:State, depth:int, cache:Dict)->List[Action]:
     '''
     Get a resulting state value after taking an action
     '''
-    #flag, value = cache.get((state.takeAction(action), 0), ("__eq_", 0))
-    flag, value = cache.get((state.takeAction(action), depth+1), ("__eq_", 0))
-    return value
+    return cache.cachedValue(state.takeAction(action), depth+1)
   
   actions = state.getActions()
   if depth%2==0:
     sortedActions = sorted(actions, key=lambda action: getActionValue(action), reverse =True)
   else:
     sortedActions = sorted(actions, key=lambda action: getActionValue(action), reverse=False)
-  return sortedActions
\ No newline at end of file
+  return sortedActions
+
+'''
+An expansion policy ordering actions with the killer-move and history heuristics.
+Minimax reports every action causing a cutoff to recordCutoff():
+- the last `numKillers` distinct cutoff actions of each depth (the killer moves) are tried first at that depth,
+  since a move refuting one position often refutes its siblings too,
+- the other actions are sorted by their history score, the sum of remainingDepth**2 over their cutoffs
+  anywhere in the tree, ties keeping the order of state.getActions().
+With candidateRadius, only the candidate cells are ordered, as in NeighborhoodExpansion(candidateRadius).
+Actions are used as dictionary keys, so they should be hashable and equal across states, as MNK actions are.
+Use one instance per agent, e.g. MinimaxIDS(..., expansionPolicy=KillerHistoryExpansion()).
+'''
+class KillerHistoryExpansion:
+  def __init__(self, numKillers:int=2, candidateRadius:Optional[int]=None):
+    self.numKillers = numKillers
+    self.candidateRadius = candidateRadius
+    self.killers = defaultdict(list)  # {depth: [action, ...]}, most recent first
+    self.history = defaultdict(int)   # {action: score}
+
+  def __call__(self, state:State, depth:int, cache:Dict)->List[Action]:
+    actions = state.getActions() if self.candidateRadius is None else candidateActions(state, self.candidateRadius)
+    history, killers = self.history, self.killers.get(depth, ())
+    if history:
+      actions.sort(key=lambda action: -history.get(action, 0))
+    if killers:
+      firstActions = [killer for killer in killers if killer in actions]
+      actions = firstActions+[action for action in actions if action not in firstActions]
+    return actions
+
+  def recordCutoff(self, action:Action, depth:int, remainingDepth:int)->None:
+    killers = self.killers[depth]
+    if not killers or killers[0]!=action:
+      if action in killers: killers.remove(action)
+      killers.insert(0, action)
+      del killers[self.numKillers:]
+    self.history[action] += remainingDepth*remainingDepth
+
+  def clear(self)->None:
+    '''
+    Forget the killer moves and the history scores
+    '''
+    self.killers.clear()
+    self.history.clear()
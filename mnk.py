@@ -1,17 +1,30 @@
 from prototype import State, Action, Search
-from typing import List, Any, Tuple, Any
-import pickle
+from typing import List, Any, Tuple, Optional
+from functools import lru_cache
+from itertools import compress
+from geometry import boardGeometry
+import random
+import struct
 
 '''
 An MNK Action.
 An action is characterize by placing a player's sign (such as "X")
 at (m,n) coordinate of the board.
+Actions handed out by MNK states are interned (see actionTable) and reused for the whole game,
+so they should be treated as immutable.
 '''
 class MNKAction(Action):
-  def __init__(self, playerSign:Any, m:int, n:int):
+  __slots__ = ("playerSign", "m", "n", "index", "_hash")
+
+  def __init__(self, playerSign:Any, m:int, n:int, index:Optional[int]=None):
+    '''
+    index: flat index (m*numCols+n) of the cell on the board. None if the board size is unknown.
+    '''
     self.playerSign = playerSign
     self.m = m
     self.n = n
+    self.index = index
+    self._hash = hash((playerSign, m, n))
   
   def __str__(self):
     return str((self.m, self.n))
@@ -20,6 +33,7 @@ class MNKAction(Action):
     return str(self)
   
   def __eq__(self, other):
+    if self is other: return True
     return self.__class__ == other.__class__ and self.playerSign==other.playerSign and self.m==other.m and self.n == other.n
 
   def __lt__(self, other):
@@ -29,7 +43,56 @@ class MNKAction(Action):
     return self.m < other.m
   
   def __hash__(self) -> int:
-      return hash((self.playerSign, self.m, self.n))
+      return self._hash
+
+  def __reduce__(self):
+    '''
+    Pickle the constructor arguments only: _hash depends on the hash seed of the process
+    '''
+    return (self.__class__, (self.playerSign, self.m, self.n, self.index))
+
+@lru_cache(maxsize=None)
+def actionTable(m:int, n:int, playerSign:Any)->Tuple[MNKAction, ...]:
+  '''
+  Returns the interned actions of `playerSign` on an m*n board.
+  table[i*n+j] is the action placing `playerSign` at (i,j).
+  '''
+  return tuple(MNKAction(playerSign, i, j, i*n+j) for i in range(m) for j in range(n))
+
+@lru_cache(maxsize=None)
+def zobristTable(m:int, n:int, numPlayers:int)->Tuple[Tuple[int, ...], ...]:
+  '''
+  Returns one random 64-bit key per (player, cell) for an m*n board.
+  table[playerIdx][i*n+j] is XOR-ed into a state's key when playerIdx places a sign at (i,j).
+  The keys are drawn from a fixed seed so that every process builds the same table,
+  and keys computed in one process stay valid in another.
+  '''
+  rng = random.Random(m*1000003 + n*1009 + numPlayers)
+  return tuple(tuple(rng.getrandbits(64) for _ in range(m*n)) for _ in range(numPlayers))
+
+@lru_cache(maxsize=None)
+def symmetryMaps(m:int, n:int)->Tuple[Tuple[int, ...], ...]:
+  '''
+  Returns the symmetries of an m*n board as cell permutations:
+  maps[t][i*n+j] is the flat index that cell (i,j) is moved to by the transform t.
+  Transform 0 is the identity. Transforms 1-3 (flip rows, flip cols, rotate 180 degrees)
+  apply to every board, and transforms 4-7 (transpose, rotate 90 degrees, rotate 270 degrees,
+  anti-transpose) only to square boards.
+  '''
+  transforms = [lambda i, j: (i, j), lambda i, j: (m-1-i, j),
+                lambda i, j: (i, n-1-j), lambda i, j: (m-1-i, n-1-j)]
+  if m==n:
+    transforms += [lambda i, j: (j, i), lambda i, j: (j, n-1-i),
+                   lambda i, j: (n-1-j, i), lambda i, j: (n-1-j, n-1-i)]
+  maps = []
+  for transform in transforms:
+    cellMap = []
+    for i in range(m):
+      for j in range(n):
+        ti, tj = transform(i, j)
+        cellMap.append(ti*n+tj)
+    maps.append(tuple(cellMap))
+  return tuple(maps)
 
 '''
 A Human Player Agent for the MNK Game
@@ -53,7 +116,7 @@ An MNK Game State.
 The Tic-Tac-Toe game is an example of m=n=k=3
 '''
 class MNK(State):
-  def __init__(self, m:int, n:int, k:int, playerSigns:List, emptySign:Any="-") -> None:
+  def __init__(self, m:int, n:int, k:int, playerSigns:List, emptySign:Any="-", trackThreats:bool=False, candidateRadius:Optional[int]=None) -> None:
     '''
     m: number of rows of the board
     n: number of cols of the board
@@ -61,6 +124,10 @@ class MNK(State):
     playerSigns: a list of signs, each representing a player. Ex: ["X","O"]
     emptySign: represents that a particular cell is empty, and available for taking action. 
                 emptySign cannot be the same as any of the playerSigns
+    trackThreats: whether to keep per-window stone counts up to date on every move, 
+                  so that getThreatCounts() costs nothing. See BoardGeometry.windows.
+    candidateRadius: if given, keep the set of cells at most candidateRadius rows and cols away from a sign
+                     up to date on every move, so that getCandidateActions() costs nothing. See trackCandidates().
     '''
     if k > min(m, n):
       raise Exception("k has to be smaller or equal to min (m, n)")
@@ -70,6 +137,7 @@ class MNK(State):
     self.n = n
     self.k = k
     self.playerSigns = playerSigns[:]
+    self.playerIndex = {sign:idx for idx, sign in enumerate(playerSigns)}
     # The first element self.playerSignsRotation represents the currentPlayer
     # self.playerSignsRotation is a circular queue: the player that took an action
     # is placed as the end of the queue.
@@ -83,12 +151,62 @@ class MNK(State):
     self.utility = tuple([0 for i in range(len(playerSigns))]) # draw by default
     # Board of m*n filled with emptySign
     self.board = [[emptySign for j in range(n)] for i in range(m)]
+    # 64-bit Zobrist key of the board, updated incrementally by takeAction.
+    # Search code can key its tables on this int instead of the state object.
+    self.zobristKey = 0
+    # The Zobrist keys of each player's sign on each cell, shared by all the states of the game
+    self.zobristKeys = zobristTable(m, n, len(playerSigns))
+    # Zobrist keys of the board under each symmetry of symmetryMaps(m, n), None until getCanonicalKey() is called.
+    # Most searches never canonicalize, so they do not pay for updating them on every move.
+    self.symmetryKeys = None
+    # Undo records of moves taken in place with makeMove(). See undoMove()
+    self.moveHistory = []
+    # Flat indices (i*n+j) of the empty cells, updated in O(1) per move
+    self.emptyCells = set(range(m*n))
+    # Flat board of player codes: 0 for an empty cell, playerIdx+1 otherwise. See getCellsView()
+    self.cells = bytearray(m*n)
+    # Cached read-only board of signs, dropped whenever the board changes. See getBoardView()
+    self._boardView = None
+    self.trackThreats = trackThreats
+    if trackThreats:
+      numWindows = len(boardGeometry(m, n, k).windows)
+      # windowCounts[w*numPlayers+playerIdx]: number of signs of playerIdx in the window w
+      self.windowCounts = [0]*(numWindows*len(playerSigns))
+      self.windowTotals = [0]*numWindows
+      # The only player with signs in the window, -1 if it is empty, -2 if several players have signs in it
+      self.windowOwners = [-1]*numWindows
+      # threatCounts[playerIdx][c]: number of windows holding c signs of playerIdx and no other sign
+      self.threatCounts = [[0]*(k+1) for _ in playerSigns]
+    self.candidateRadius = candidateRadius
+    if candidateRadius is not None:
+      # neighborCounts[i*n+j]: number of signs at most candidateRadius rows and cols away from (i,j)
+      self.neighborCounts = [0]*(m*n)
+      # The flat indices of the cells with a sign in their neighborhood, empty or not
+      self.nearCells = set()
   
-  def getBoard(self)->'MNK': 
+  def getBoard(self)->List[List]: 
     '''
-    Returns a deep-copied board to prevent accidental modification
+    Returns a copied board to prevent accidental modification
     '''
-    return pickle.loads(pickle.dumps(self.board))
+    return [row[:] for row in self.board]
+
+  def getBoardView(self)->Tuple[Tuple, ...]:
+    '''
+    Returns a read-only board: a tuple of rows, each a tuple of signs.
+    It is built at most once per position and then shared, so evaluators
+    that only read the board should prefer it over getBoard().
+    '''
+    if self._boardView is None:
+      self._boardView = tuple(map(tuple, self.board))
+    return self._boardView
+
+  def getCellsView(self)->memoryview:
+    '''
+    Returns a zero-copy, read-only view of the flat board of player codes.
+    Cell (i,j) is at index i*n+j and holds 0 if empty, or playerIdx+1 for self.playerSigns[playerIdx].
+    The view follows the state: it changes if the state is later changed in place (makeMove/undoMove).
+    '''
+    return memoryview(self.cells).toreadonly()
 
   def getPlayersSigns(self)->List[Any]: 
     '''
@@ -105,10 +223,23 @@ class MNK(State):
   def getActions(self)->List[MNKAction]:
     '''
     Returns available actions to take.
-    Returns all the cells with emptySign
+    Returns all the cells with emptySign, in row-major order
+    '''
+    table = actionTable(self.m, self.n, self.getCurrentPlayerSign())
+    return [table[idx] for idx in sorted(self.getActionIndices())]
+
+  def getAction(self, index:int)->MNKAction:
+    '''
+    Returns the current player's (interned) action at flat index `index` (i*n+j)
+    '''
+    return actionTable(self.m, self.n, self.getCurrentPlayerSign())[index]
+
+  def getActionIndices(self)->List[int]:
+    '''
+    Returns the flat indices (i*n+j) of the empty cells, in no particular order.
+    A cheap alternative to getActions() when no MNKAction objects are needed.
     '''
-    curPlayer = self.getCurrentPlayerSign()
-    return [MNKAction(curPlayer, i, j) for i in range(self.m) for j in range(self.n) if self.board[i][j] == self.emptySign]
+    return list(self.emptyCells)
 
   def isLegalAction(self, action:MNKAction)->bool:
     if (
@@ -135,16 +266,225 @@ class MNK(State):
       raise Exception("Cannot take actions in a terminal state.")
     if not self.isLegalAction(action):
       raise Exception("Illegal Action.", action)
-    stateCopy = pickle.loads(pickle.dumps(self)) if preserveState else self
-    stateCopy.board[action.m][action.n] = action.playerSign
+    stateCopy = self.clone() if preserveState else self
+    stateCopy._applyAction(action)
+    return stateCopy
+
+  def clone(self)->'MNK':
+    '''
+    Returns an independent copy of the state.
+    Only the mutable fields are copied; the rest is shared with the original.
+    '''
+    stateCopy = self.__class__.__new__(self.__class__)
+    stateCopy.__dict__.update(self.__dict__)
+    stateCopy.board = [row[:] for row in self.board]
+    stateCopy.playerSignsRotation = self.playerSignsRotation[:]
+    stateCopy.moveHistory = self.moveHistory[:]
+    if self.symmetryKeys is not None: stateCopy.symmetryKeys = self.symmetryKeys[:]
+    stateCopy.emptyCells = set(self.emptyCells)
+    stateCopy.cells = bytearray(self.cells)
+    if self.trackThreats: self._copyThreats(stateCopy)
+    if self.candidateRadius is not None: self._copyCandidates(stateCopy)
+    return stateCopy
+
+  def _copyCandidates(self, stateCopy:'MNK')->None:
+    stateCopy.neighborCounts = self.neighborCounts[:]
+    stateCopy.nearCells = set(self.nearCells)
+
+  def _copyThreats(self, stateCopy:'MNK')->None:
+    stateCopy.windowCounts = self.windowCounts[:]
+    stateCopy.windowTotals = self.windowTotals[:]
+    stateCopy.windowOwners = self.windowOwners[:]
+    stateCopy.threatCounts = [threats[:] for threats in self.threatCounts]
+
+  def makeMove(self, action:MNKAction)->None:
+    '''
+    Take an action in place, without copying the state.
+    Same rules as takeAction. The information needed to restore the current
+    state is pushed onto self.moveHistory so that undoMove() can revert it exactly.
+    Lets search code walk a tree on one mutable state instead of one copy per node.
+    '''
+    if self.isTerminal():
+      raise Exception("Cannot take actions in a terminal state.")
+    if not self.isLegalAction(action):
+      raise Exception("Illegal Action.", action)
+    self.moveHistory.append((action, self.lastAction, self._isTerminal, self.utility))
+    self._applyAction(action)
+
+  def undoMove(self)->None:
+    '''
+    Revert the last makeMove(): the board, player rotation, remainingMoves,
+    lastAction and the terminal/utility flags are restored.
+    '''
+    if not self.moveHistory:
+      raise Exception("No move to undo.")
+    action, self.lastAction, self._isTerminal, self.utility = self.moveHistory.pop()
+    self._removeSign(action)
+    ## Rotate the Players Sign back
+    self.playerSignsRotation.pop()
+    self.playerSignsRotation.insert(0, action.playerSign)
+    ## End Rotate the Players Sign back
+    self.remainingMoves+=1
+
+  def _applyAction(self, action:MNKAction)->None:
+    '''
+    Place the sign and update the playerSignsRotation, remainingMoves and lastAction.
+    Assumes the action is legal.
+    '''
+    self._placeSign(action)
     ## Rotate the Players Sign
-    stateCopy.playerSignsRotation.pop(0)
-    stateCopy.playerSignsRotation.append(action.playerSign)
+    self.playerSignsRotation.pop(0)
+    self.playerSignsRotation.append(action.playerSign)
     ## End Rotate the Players Sign
-    stateCopy.remainingMoves-=1
-    stateCopy.lastAction = action
-    return stateCopy
+    self.remainingMoves-=1
+    self.lastAction = action
+
+  def _placeSign(self, action:MNKAction)->None:
+    index = action.m*self.n+action.n
+    self.board[action.m][action.n] = action.playerSign
+    self.emptyCells.discard(index)
+    self.cells[index] = self.playerIndex[action.playerSign]+1
+    self._updateKeys(action)
+    if self.trackThreats: self._updateThreats(action, 1)
+    if self.candidateRadius is not None: self._updateCandidates(index, 1)
+    self._boardView = None
+
+  def _removeSign(self, action:MNKAction)->None:
+    index = action.m*self.n+action.n
+    self.board[action.m][action.n] = self.emptySign
+    self.emptyCells.add(index)
+    self.cells[index] = 0
+    self._updateKeys(action)
+    if self.trackThreats: self._updateThreats(action, -1)
+    if self.candidateRadius is not None: self._updateCandidates(index, -1)
+    self._boardView = None
+
+  def _updateKeys(self, action:MNKAction)->None:
+    '''
+    XOR the sign placed or removed by `action` into the Zobrist key, and into the symmetry keys if they are tracked
+    '''
+    index = action.m*self.n+action.n
+    playerKeys = self.zobristKeys[self.playerIndex[action.playerSign]]
+    self.zobristKey ^= playerKeys[index]
+    symmetryKeys = self.symmetryKeys
+    if symmetryKeys is not None:
+      for transform, cellMap in enumerate(symmetryMaps(self.m, self.n)):
+        symmetryKeys[transform] ^= playerKeys[cellMap[index]]
   
+  def zobristCellKey(self, action:MNKAction)->int:
+    '''
+    Returns the Zobrist key of placing action.playerSign at (action.m, action.n)
+    '''
+    return self.zobristKeys[self.playerIndex[action.playerSign]][action.m*self.n+action.n]
+
+  def _updateThreats(self, action:MNKAction, delta:int)->None:
+    '''
+    Update the windows through the cell of `action` after its sign is placed (delta=1) or removed (delta=-1).
+    Only the k windows per direction covering the cell are touched.
+    '''
+    numPlayers = len(self.playerSigns)
+    playerIdx = self.playerIndex[action.playerSign]
+    counts, totals, owners, threats = self.windowCounts, self.windowTotals, self.windowOwners, self.threatCounts
+    for w in boardGeometry(self.m, self.n, self.k).windowsThroughCell[action.m*self.n+action.n]:
+      owner, total = owners[w], totals[w]
+      if owner>=0: threats[owner][total]-=1
+      base = w*numPlayers
+      counts[base+playerIdx]+=delta
+      total+=delta
+      totals[w] = total
+      if total==0: owner = -1
+      elif counts[base+playerIdx]==total: owner = playerIdx
+      elif owner==-2 and delta<0:
+        # The window might only hold one player's signs again
+        owner = next((idx for idx in range(numPlayers) if counts[base+idx]==total), -2)
+      else: owner = -2
+      owners[w] = owner
+      if owner>=0: threats[owner][total]+=1
+
+  def _updateCandidates(self, index:int, delta:int)->None:
+    '''
+    Update the neighborhood of the cell `index` after its sign is placed (delta=1) or removed (delta=-1)
+    '''
+    counts, nearCells = self.neighborCounts, self.nearCells
+    for neighbor in boardGeometry(self.m, self.n, self.k).neighborhood(self.candidateRadius)[index]:
+      counts[neighbor]+=delta
+      if delta>0:
+        if counts[neighbor]==1: nearCells.add(neighbor)
+      elif counts[neighbor]==0: nearCells.discard(neighbor)
+
+  def trackCandidates(self, radius:int)->None:
+    '''
+    Start keeping the candidate cells up to date on every move: the empty cells at most `radius` rows and cols
+    away from a sign, where almost all useful moves lie on large boards. See getCandidateActions().
+    The states copied from this one (clone, takeAction) keep tracking them.
+    '''
+    self.candidateRadius = radius
+    self.neighborCounts = [0]*(self.m*self.n)
+    self.nearCells = set()
+    for index, code in enumerate(self.getCellsView()):
+      if code: self._updateCandidates(index, 1)
+
+  def getCandidateIndices(self)->List[int]:
+    '''
+    Returns the flat indices of the candidate cells, in row-major order.
+    All the empty cells are candidates while the board has no sign, or if none is near a sign.
+    Requires candidateRadius (see trackCandidates).
+    '''
+    if self.candidateRadius is None:
+      raise Exception("Candidates are not tracked. Create the state with candidateRadius, or call trackCandidates().")
+    candidates = self.nearCells & self.emptyCells
+    return sorted(candidates) if candidates else sorted(self.getActionIndices())
+
+  def getCandidateActions(self)->List[MNKAction]:
+    '''
+    Returns the actions on the candidate cells (see getCandidateIndices), in row-major order
+    '''
+    table = actionTable(self.m, self.n, self.getCurrentPlayerSign())
+    return [table[idx] for idx in self.getCandidateIndices()]
+
+  def getThreatCounts(self, playerSign:Any)->List[int]:
+    '''
+    Returns a list `threats` of length k+1: threats[c] is the number of length-k windows
+    (along a row, col, or diagonal) holding c signs of `playerSign` and no sign of the other players.
+    For instance threats[k-1] counts open k-1 threats, and threats[k]>0 means the player connected k signs.
+    Requires trackThreats.
+    '''
+    if not self.trackThreats:
+      raise Exception("Threats are not tracked. Create the state with trackThreats=True.")
+    return self.threatCounts[self.playerIndex[playerSign]][:]
+
+  def getCanonicalKey(self)->Tuple[int, int]:
+    '''
+    Returns (key, transform): the smallest Zobrist key over all the symmetric images of
+    the board (see symmetryMaps), and the transform mapping this board onto that image.
+    Symmetric positions share the same key, so it can be used to key transposition lookups.
+    The first call computes the symmetry keys from the board; from then on every move updates them,
+    and so do the moves of the states copied from this one.
+    '''
+    if self.symmetryKeys is None: self._initSymmetryKeys()
+    key = min(self.symmetryKeys)
+    return key, self.symmetryKeys.index(key)
+
+  def _initSymmetryKeys(self)->None:
+    symmetryKeys = [0 for _ in symmetryMaps(self.m, self.n)]
+    for index, code in enumerate(self.getCellsView()):
+      if not code: continue
+      playerKeys = self.zobristKeys[code-1]
+      for transform, cellMap in enumerate(symmetryMaps(self.m, self.n)):
+        symmetryKeys[transform] ^= playerKeys[cellMap[index]]
+    self.symmetryKeys = symmetryKeys
+
+  def transformAction(self, action:MNKAction, transform:int, inverse:bool=False)->MNKAction:
+    '''
+    Returns the action mapped by the symmetry `transform` (see symmetryMaps),
+    or by its inverse if `inverse`. For instance, a best move stored for the canonical
+    image is mapped back to this board with transformAction(move, transform, inverse=True).
+    '''
+    index = action.m*self.n+action.n
+    cellMap = symmetryMaps(self.m, self.n)[transform]
+    targetIndex = cellMap.index(index) if inverse else cellMap[index]
+    return actionTable(self.m, self.n, action.playerSign)[targetIndex]
+
   def isTerminal(self)->bool:
     '''
     Whether it is a terminal state.
@@ -170,77 +510,36 @@ class MNK(State):
     in a row, col, or diagonally.
     Updates self.reward, and self._isTerminal if needed.
     '''
-    def encodeUtility()->None:
-      '''
-      Encodes reward properly
-      (-1,-1,1,-1) means the third player wins and get reward of 1
-      and the other lose (-1 reward)
-      '''
-      utility = []
-      for sign in self.playerSigns:
-        if sign == self.lastAction.playerSign:
-          utility.append(1)
-        else:
-          utility.append(-1)
-      self.utility = tuple(utility)
-    
     lastAction = self.lastAction
     if not lastAction: return False  # No action taken yet
-    lastPlayerSign = lastAction.playerSign
+    lastPlayerCode = self.playerIndex[lastAction.playerSign]+1
+    cells = self.cells
     ######## Check if there's a winner ########
-    leftMost = max(0, lastAction.n-(self.k-1))
-    rightMost = min(self.n-1, lastAction.n+(self.k-1))
-    topMost = max(0, lastAction.m-(self.k-1))
-    bottomMost = min(self.m-1, lastAction.m+(self.k-1))
-
-    #### Check row ####
-    l, r  = leftMost, rightMost
-    runningK = 0
-    while l<=r:
-      runningK=runningK+1 if self.board[lastAction.m][l]==lastPlayerSign else 0
-      l+=1
-      if runningK==self.k: 
-        encodeUtility()
-        self._isTerminal = True
-        return True
-    #### Check col ####
-    top, bottom = topMost, bottomMost
-    runningK = 0
-    while top<=bottom:
-      runningK=runningK+1 if self.board[top][lastAction.n]==lastPlayerSign else 0
-      top+=1
-      if runningK==self.k: 
-        encodeUtility() 
-        self._isTerminal = True
-        return True
-    #### Check Diag1 ####
-    minDist = min(lastAction.m-topMost, lastAction.n-leftMost)
-    top, l = lastAction.m-minDist, lastAction.n-minDist
-    bottom, r = bottomMost, rightMost
-    runningK = 0
-    while top<=bottom and l<=r:
-      runningK=runningK+1 if self.board[top][l]==lastPlayerSign else 0
-      top+=1
-      l+=1
-      if runningK==self.k: 
-        encodeUtility()
-        self._isTerminal = True
-        return True
-    #### Check Diag2 ####
-    minDist = min(lastAction.m-topMost, rightMost-lastAction.n)
-    top, r = lastAction.m-minDist, lastAction.n+minDist
-    bottom, l = bottomMost, leftMost
-    runningK = 0
-    while top<=bottom and l<=r:
-      runningK=runningK+1 if self.board[top][r]==lastPlayerSign else 0
-      top+=1
-      r-=1
-      if runningK==self.k: 
-        encodeUtility()
-        self._isTerminal = True
-        return True
+    # Only the row, col and diagonals through the last action, at most k-1 cells away from it, are checked
+    for segment in boardGeometry(self.m, self.n, self.k).segmentsThroughCell[lastAction.m*self.n+lastAction.n]:
+      runningK = 0
+      for index in segment:
+        runningK=runningK+1 if cells[index]==lastPlayerCode else 0
+        if runningK==self.k:
+          self._encodeUtility()
+          self._isTerminal = True
+          return True
     return False
   
+  def _encodeUtility(self)->None:
+    '''
+    Encodes reward properly
+    (-1,-1,1,-1) means the third player wins and get reward of 1
+    and the other lose (-1 reward)
+    '''
+    utility = []
+    for sign in self.playerSigns:
+      if sign == self.lastAction.playerSign:
+        utility.append(1)
+      else:
+        utility.append(-1)
+    self.utility = tuple(utility)
+
   def getUtility(self)->Tuple:
     '''
     Get the utility from this game state.
@@ -249,6 +548,71 @@ class MNK(State):
     self.checkWinner()
     return self.utility
 
+  # Header of toBytes(): magic, version, m, n, k, number of players, index of the current player,
+  # bits per cell, flat index of the last action + 1 (0 if none), trackThreats, candidateRadius + 1 (0 if None)
+  _BYTES_HEADER = struct.Struct(">3sBHHHBBBIBB")
+  _BYTES_MAGIC = b"MNK"
+  _BYTES_VERSION = 2
+
+  def toBytes(self)->bytes:
+    '''
+    Encodes the position into a compact binary string, without pickle.
+    The layout is a fixed header (see _BYTES_HEADER), the emptySign and playerSigns
+    as length-prefixed utf-8 strings, and then the cells in row-major order,
+    packed 2 bits per cell (4 bits if there are more than 3 players, 8 if more than 15).
+    The player to move, remainingMoves, and the terminal status and utility follow from
+    the cells and the last action. The undo history of makeMove() is not kept, but the tracking
+    (trackThreats, candidateRadius) is, so the decoded state serves the same evaluation and expansion policies.
+    Signs have to be strings.
+    '''
+    signs = [self.emptySign] + self.playerSigns
+    if not all(isinstance(sign, str) for sign in signs):
+      raise Exception("Only states with string signs can be encoded.")
+    # The smallest of 2, 4, 8 bits that holds the codes 0..numPlayers
+    bitsPerCell = 2
+    while len(self.playerSigns)>>bitsPerCell: bitsPerCell<<=1
+    lastIndex = self.lastAction.m*self.n+self.lastAction.n+1 if self.lastAction else 0
+    header = self._BYTES_HEADER.pack(self._BYTES_MAGIC, self._BYTES_VERSION, self.m, self.n, self.k,
+                                     len(self.playerSigns), self.playerIndex[self.getCurrentPlayerSign()],
+                                     bitsPerCell, lastIndex, self.trackThreats,
+                                     0 if self.candidateRadius is None else self.candidateRadius+1)
+    encodedSigns = b"".join(bytes([len(sign.encode())]) + sign.encode() for sign in signs)
+    packed = 0
+    for index, code in enumerate(self.getCellsView()):
+      packed |= code<<(index*bitsPerCell)
+    return header + encodedSigns + packed.to_bytes((self.m*self.n*bitsPerCell+7)//8, "little")
+
+  @classmethod
+  def fromBytes(cls, data:bytes)->'MNK':
+    '''
+    Decodes a position encoded by toBytes()
+    '''
+    magic, version, m, n, k, numPlayers, currentPlayer, bitsPerCell, lastIndex, trackThreats, candidateRadius = \
+      cls._BYTES_HEADER.unpack_from(data)
+    if magic!=cls._BYTES_MAGIC or version!=cls._BYTES_VERSION:
+      raise Exception("Not an encoded MNK state.")
+    offset = cls._BYTES_HEADER.size
+    signs = []
+    for _ in range(numPlayers+1):
+      length = data[offset]
+      signs.append(data[offset+1:offset+1+length].decode())
+      offset += 1+length
+    emptySign, playerSigns = signs[0], signs[1:]
+    state = cls(m, n, k, playerSigns, emptySign, bool(trackThreats), candidateRadius-1 if candidateRadius else None)
+    packed = int.from_bytes(data[offset:], "little")
+    cellMask = (1<<bitsPerCell)-1
+    tables = [actionTable(m, n, sign) for sign in playerSigns]
+    for index in range(m*n):
+      code = (packed>>(index*bitsPerCell)) & cellMask
+      if code:
+        state._placeSign(tables[code-1][index])
+        state.remainingMoves -= 1
+    state.playerSignsRotation = playerSigns[currentPlayer:] + playerSigns[:currentPlayer]
+    if lastIndex:
+      code = (packed>>((lastIndex-1)*bitsPerCell)) & cellMask
+      state.lastAction = tables[code-1][lastIndex-1]
+    return state
+
   def __str__(self)->str:
     '''
     Prints the 2D board properly so that each
@@ -257,7 +621,196 @@ class MNK(State):
     return '\n'.join(map(lambda x: ' '.join(map(str, x)), self.board))
   
   def __hash__(self) -> int:
-    return hash(tuple(tuple(row) for row in self.board))
+    return self.zobristKey
   
   def __eq__(self, other: object) -> bool:
-    return self.__class__ == other.__class__ and self.board == other.board
\ No newline at end of file
+    # Compare the cheap Zobrist keys first, and only then the boards
+    return self.__class__ == other.__class__ and self.zobristKey == other.zobristKey and self.board == other.board
+
+@lru_cache(maxsize=None)
+def bitIndexTable(m:int, n:int)->Tuple[int, ...]:
+  '''
+  Returns the flat index (i*n+j) of every bit of a BitboardMNK bitboard: table[i*(n+1)+j] is i*n+j,
+  and the padding bits map to -1.
+  '''
+  return tuple(i*n+j if j<n else -1 for i in range(m) for j in range(n+1))
+
+@lru_cache(maxsize=None)
+def bitActionTable(m:int, n:int, playerSign:Any)->Tuple[Optional[MNKAction], ...]:
+  '''
+  Returns the interned actions of `playerSign` indexed by the bits of a BitboardMNK bitboard,
+  None for the padding bits. See actionTable.
+  '''
+  actions = actionTable(m, n, playerSign)
+  return tuple(actions[idx] if idx>=0 else None for idx in bitIndexTable(m, n))
+
+_BIT_SELECTORS = bytes.maketrans(b"01", b"\x00\x01")
+
+def bitSelectors(bitboard:int)->bytes:
+  '''
+  Returns one byte per bit of a non-negative `bitboard`, lowest bit first: 1 if the bit is set, 0 otherwise.
+  With itertools.compress it picks the entries of a bit-indexed table without a Python loop over the bits.
+  '''
+  return bin(bitboard)[:1:-1].encode().translate(_BIT_SELECTORS)
+
+'''
+An MNK Game State backed by bitboards.
+Each player owns one Python int where bit `i*(n+1)+j` is set if the player
+has a sign at (i,j). Every row is padded with one always-empty column so that
+shifting a bitboard never wraps a line from one row onto the next.
+Legal moves, placement, k-in-a-row detection and the candidate cells are all bit operations;
+the set bits are listed through tables indexed by bit position (see bitSelectors).
+It is a drop-in replacement for MNK wherever a `State` is expected.
+'''
+class BitboardMNK(MNK):
+  def __init__(self, m:int, n:int, k:int, playerSigns:List, emptySign:Any="-", trackThreats:bool=False, candidateRadius:Optional[int]=None) -> None:
+    super().__init__(m, n, k, playerSigns, emptySign, trackThreats, candidateRadius)
+    # The bitboards replace the board, the set of empty cells and the flat cells
+    del self.board
+    del self.emptyCells
+    del self.cells
+    # Bit distance between neighbouring cells along a row, col, diag1 and diag2
+    self.stride = n+1
+    self.shifts = (1, self.stride, self.stride+1, self.stride-1)
+    # Bits of all playable cells (padding column excluded)
+    rowMask = (1<<n)-1
+    self.boardMask = 0
+    for i in range(m): self.boardMask |= rowMask<<(i*self.stride)
+    # One bitboard per player, in the same order as self.playerSigns
+    self.bitboards = [0 for _ in playerSigns]
+    # The candidates are computed from the bitboards when asked for (see getCandidateIndices), not on every move
+    if candidateRadius is not None: del self.neighborCounts, self.nearCells
+
+  def getBoard(self)->List[List]:
+    '''
+    Returns the board as a newly built list of lists of signs
+    '''
+    signs, cells, n = [self.emptySign]+self.playerSigns, self.getCellsView(), self.n
+    return [[signs[code] for code in cells[i*n:(i+1)*n]] for i in range(self.m)]
+
+  def getBoardView(self)->Tuple[Tuple, ...]:
+    if self._boardView is None:
+      self._boardView = tuple(map(tuple, self.getBoard()))
+    return self._boardView
+
+  def getCellsView(self)->memoryview:
+    '''
+    Returns a read-only view of the flat board of player codes, as in MNK.getCellsView().
+    Unlike MNK, the cells are rebuilt from the bitboards, so the view is a snapshot.
+    '''
+    # One byte per bit holding the code of the player owning it, the players' bits being disjoint
+    codes = 0
+    for code, bitboard in enumerate(self.bitboards, 1):
+      if bitboard: codes += code*int.from_bytes(bitSelectors(bitboard), "little")
+    cells = bytearray(codes.to_bytes(self.m*self.stride, "little"))
+    del cells[self.n::self.stride]  # The padding column
+    return memoryview(cells).toreadonly()
+
+  def getActions(self)->List[MNKAction]:
+    '''
+    Returns available actions to take.
+    Returns all the cells with emptySign, in row-major order
+    '''
+    empty = ~self.occupied() & self.boardMask
+    return list(compress(bitActionTable(self.m, self.n, self.getCurrentPlayerSign()), bitSelectors(empty)))
+
+  def getActionIndices(self)->List[int]:
+    '''
+    Returns the flat indices (i*n+j) of the empty cells, in row-major order
+    '''
+    empty = ~self.occupied() & self.boardMask
+    return list(compress(bitIndexTable(self.m, self.n), bitSelectors(empty)))
+
+  def occupied(self)->int:
+    '''
+    Returns the bitboard of all occupied cells
+    '''
+    occupied = 0
+    for bitboard in self.bitboards: occupied |= bitboard
+    return occupied
+
+  def isLegalAction(self, action:MNKAction)->bool:
+    if (
+        action.m<0 or action.m>=self.m or
+        action.n<0 or action.n>=self.n or
+        action.playerSign!=self.getCurrentPlayerSign() or
+        self.occupied()>>(action.m*self.stride+action.n) & 1
+        ):
+      return False
+    return True
+
+  def clone(self)->'BitboardMNK':
+    stateCopy = self.__class__.__new__(self.__class__)
+    stateCopy.__dict__.update(self.__dict__)
+    stateCopy.bitboards = self.bitboards[:]
+    stateCopy.playerSignsRotation = self.playerSignsRotation[:]
+    stateCopy.moveHistory = self.moveHistory[:]
+    if self.symmetryKeys is not None: stateCopy.symmetryKeys = self.symmetryKeys[:]
+    if self.trackThreats: self._copyThreats(stateCopy)
+    return stateCopy
+
+  def _placeSign(self, action:MNKAction)->None:
+    self.bitboards[self.playerIndex[action.playerSign]] |= 1<<(action.m*self.stride+action.n)
+    self._updateKeys(action)
+    if self.trackThreats: self._updateThreats(action, 1)
+    self._boardView = None
+
+  def _removeSign(self, action:MNKAction)->None:
+    self.bitboards[self.playerIndex[action.playerSign]] &= ~(1<<(action.m*self.stride+action.n))
+    self._updateKeys(action)
+    if self.trackThreats: self._updateThreats(action, -1)
+    self._boardView = None
+
+  def trackCandidates(self, radius:int)->None:
+    '''
+    Make getCandidateActions() return the empty cells at most `radius` rows and cols away from a sign.
+    Unlike MNK, nothing is updated on every move: the candidates are computed from the bitboards when asked for.
+    '''
+    self.candidateRadius = radius
+
+  def candidateBits(self)->int:
+    '''
+    Returns the bitboard of the candidate cells (see getCandidateIndices): the occupied cells are spread
+    one cell at a time along the rows, then along the cols, candidateRadius times.
+    Masking with boardMask after every step keeps a row from spilling onto the next one.
+    '''
+    if self.candidateRadius is None:
+      raise Exception("Candidates are not tracked. Create the state with candidateRadius, or call trackCandidates().")
+    occupied, boardMask, stride = self.occupied(), self.boardMask, self.stride
+    empty = ~occupied & boardMask
+    near = occupied
+    for _ in range(self.candidateRadius): near = (near | near<<1 | near>>1) & boardMask
+    for _ in range(self.candidateRadius): near = (near | near<<stride | near>>stride) & boardMask
+    return near & empty or empty
+
+  def getCandidateIndices(self)->List[int]:
+    return list(compress(bitIndexTable(self.m, self.n), bitSelectors(self.candidateBits())))
+
+  def getCandidateActions(self)->List[MNKAction]:
+    return list(compress(bitActionTable(self.m, self.n, self.getCurrentPlayerSign()), bitSelectors(self.candidateBits())))
+
+  def checkWinner(self)->bool:
+    '''
+    Whether the last player to move connected self.k signs.
+    For each direction, AND-ing the bitboard with itself shifted by
+    1..k-1 steps leaves a bit set only where a k-long streak starts.
+    Updates self.utility, and self._isTerminal if needed.
+    '''
+    if not self.lastAction: return False  # No action taken yet
+    bitboard = self.bitboards[self.playerIndex[self.lastAction.playerSign]]
+    for shift in self.shifts:
+      streak = bitboard
+      for step in range(1, self.k):
+        streak &= bitboard>>(step*shift)
+        if not streak: break
+      if streak:
+        self._encodeUtility()
+        self._isTerminal = True
+        return True
+    return False
+
+  def __str__(self)->str:
+    return '\n'.join(map(lambda x: ' '.join(map(str, x)), self.getBoard()))
+
+  def __eq__(self, other: object) -> bool:
+    return self.__class__ == other.__class__ and self.zobristKey == other.zobristKey and self.bitboards == other.bitboards
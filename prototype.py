@@ -1,7 +1,9 @@
 from typing import List, Any
+import pickle
 
 class Action:
-  pass
+  # Empty slots so that subclasses may define __slots__ and drop the per-instance __dict__
+  __slots__ = ()
 
 '''
 A Prototype of a State
@@ -18,6 +20,29 @@ class State:
     pass
   def getUtility(self)->Any:
     pass
+  def clone(self)->'State':
+    '''
+    Returns an independent copy of the state.
+    Subclasses may override it with a cheaper copy of their mutable fields.
+    '''
+    return pickle.loads(pickle.dumps(self))
+
+'''
+Raised inside a search whose deadline has passed, to unwind it (see Minimax `deadline`)
+'''
+class SearchTimeout(Exception):
+  pass
+
+'''
+The put() of a Queue, appending every item to a list.
+It collects the actions of a searchUntil() run in this process (see MinimaxIDS and MCTS `inProcess`).
+'''
+class ListQueue:
+  def __init__(self, items:List):
+    self.items = items
+
+  def put(self, item)->None:
+    self.items.append(item)
 
 '''
 A Prototype of a Search object
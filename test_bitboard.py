@@ -0,0 +1,77 @@
+import random
+import unittest
+from mnk import MNK, BitboardMNK
+
+'''
+Parity of BitboardMNK with MNK: random games are played on both in lockstep, with moves taken and undone,
+and the two states must agree after every step.
+Run from the repository root: python -m unittest test_bitboard
+'''
+class TestBitboardParity(unittest.TestCase):
+  SHAPES = [(3, 3, 3), (4, 4, 3), (5, 4, 4), (6, 7, 4), (8, 8, 5), (3, 6, 2), (1, 5, 1), (15, 15, 5)]
+
+  def assertSameState(self, state:MNK, bitboardState:BitboardMNK)->None:
+    self.assertEqual(state.getActions(), bitboardState.getActions())
+    self.assertEqual(state.getBoard(), bitboardState.getBoard())
+    self.assertEqual(bytes(state.getCellsView()), bytes(bitboardState.getCellsView()))
+    self.assertEqual(state.isTerminal(), bitboardState.isTerminal())
+    self.assertEqual(state.getUtility(), bitboardState.getUtility())
+    self.assertEqual(state.zobristKey, bitboardState.zobristKey)
+    self.assertEqual(state.getCurrentPlayerSign(), bitboardState.getCurrentPlayerSign())
+    if state.candidateRadius is not None:
+      self.assertEqual(state.getCandidateActions(), bitboardState.getCandidateActions())
+
+  def playInLockstep(self, rng:random.Random, m:int, n:int, k:int, playerSigns:list, candidateRadius:int=None)->None:
+    state = MNK(m, n, k, playerSigns, candidateRadius=candidateRadius)
+    bitboardState = BitboardMNK(m, n, k, playerSigns, candidateRadius=candidateRadius)
+    self.assertSameState(state, bitboardState)
+    while not state.isTerminal():
+      if state.moveHistory and rng.random()<0.25:
+        state.undoMove()
+        bitboardState.undoMove()
+      else:
+        action = rng.choice(state.getActions())
+        state.makeMove(action)
+        bitboardState.makeMove(action)
+      self.assertSameState(state, bitboardState)
+    while state.moveHistory:
+      state.undoMove()
+      bitboardState.undoMove()
+      self.assertSameState(state, bitboardState)
+
+  def testTwoPlayers(self):
+    rng = random.Random(0)
+    for m, n, k in self.SHAPES:
+      for _ in range(5):
+        with self.subTest(m=m, n=n, k=k):
+          self.playInLockstep(rng, m, n, k, ["X", "O"])
+
+  def testThreePlayers(self):
+    rng = random.Random(1)
+    for m, n, k in self.SHAPES:
+      for _ in range(3):
+        with self.subTest(m=m, n=n, k=k):
+          self.playInLockstep(rng, m, n, k, ["X", "O", "A"])
+
+  def testCandidates(self):
+    rng = random.Random(3)
+    for m, n, k in self.SHAPES:
+      for radius in (1, 2, 3):
+        with self.subTest(m=m, n=n, k=k, radius=radius):
+          self.playInLockstep(rng, m, n, k, ["X", "O"], radius)
+
+  def testTakeActionAndClone(self):
+    rng = random.Random(2)
+    for m, n, k in self.SHAPES:
+      state, bitboardState = MNK(m, n, k, ["X", "O"]), BitboardMNK(m, n, k, ["X", "O"])
+      while not state.isTerminal():
+        action = rng.choice(state.getActions())
+        nextState, nextBitboardState = state.takeAction(action), bitboardState.takeAction(action)
+        # The original states are left untouched
+        self.assertSameState(state, bitboardState)
+        self.assertSameState(nextState, nextBitboardState)
+        state, bitboardState = nextState.clone(), nextBitboardState.clone()
+        self.assertSameState(state, bitboardState)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,61 @@
+import random
+import unittest
+import numpy as np
+from mnk import MNK
+from evaluation import utilityMNK, batchUtilityMNK, vectorizedUtilityMNK, EvaluationCache
+
+'''
+Parity of the numpy evaluators with utilityMNK on seeded random positions.
+Run from the repository root: python -m unittest test_evaluation
+'''
+class TestBatchUtilityParity(unittest.TestCase):
+  SHAPES = [(3, 3, 3), (4, 4, 3), (5, 4, 4), (6, 7, 4), (8, 8, 5), (3, 6, 2), (1, 5, 1), (9, 9, 5)]
+
+  def randomPositions(self, rng:random.Random, m:int, n:int, k:int, playerSigns:list, count:int)->list:
+    '''
+    Returns `count` positions reached by random moves, from the empty board to terminal ones
+    '''
+    states = []
+    for _ in range(count):
+      state = MNK(m, n, k, playerSigns)
+      for _ in range(rng.randrange(m*n+1)):
+        if state.isTerminal(): break
+        state.makeMove(rng.choice(state.getActions()))
+      states.append(state)
+    return states
+
+  def checkShapes(self, seed:int, playerSigns:list)->None:
+    rng = random.Random(seed)
+    for m, n, k in self.SHAPES:
+      states = self.randomPositions(rng, m, n, k, playerSigns, 30)
+      boards = np.stack([np.frombuffer(state.getCellsView(), dtype=np.uint8).reshape(m, n) for state in states])
+      currentPlayers = np.array([state.playerIndex[state.getCurrentPlayerSign()] for state in states])
+      for depth in (0, 1):
+        with self.subTest(m=m, n=n, k=k, depth=depth):
+          expected = [utilityMNK(state, depth) for state in states]
+          # Terminal positions score about 1e9, hence a relative tolerance
+          np.testing.assert_allclose(batchUtilityMNK(boards, k, currentPlayers, depth), expected, rtol=1e-12, atol=1e-9)
+          np.testing.assert_allclose([vectorizedUtilityMNK(state, depth) for state in states], expected, rtol=1e-12, atol=1e-9)
+
+  def testTwoPlayers(self):
+    self.checkShapes(0, ["X", "O"])
+
+  def testThreePlayers(self):
+    self.checkShapes(1, ["X", "O", "A"])
+
+class TestEvaluationCache(unittest.TestCase):
+  def testSharedAcrossK(self):
+    '''
+    The same moves on boards of different k have the same Zobrist key, but not the same score
+    '''
+    cache = EvaluationCache()
+    for k in (3, 4, 5):
+      state = MNK(8, 8, k, ["X", "O"])
+      for i, j in [(3, 3), (4, 4), (3, 4), (2, 2), (3, 5)]: state.makeMove(state.getAction(i*8+j))
+      for depth in (0, 1):
+        with self.subTest(k=k, depth=depth):
+          self.assertEqual(cache(state, depth), utilityMNK(state, depth))
+    self.assertEqual(len(cache), 3)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,54 @@
+import random
+import unittest
+from mnk import MNK
+from mcts import MCTS, UCB, linearExpansion, randomRollout, NeighborhoodExpansion
+from utils import sumTuple
+
+'''
+MCTS keeping its tree between the moves of a game.
+Run from the repository root: python -m unittest test_mcts
+'''
+class TestReuseTree(unittest.TestCase):
+  def playWithMakeMove(self, inPlace:bool)->None:
+    '''
+    Both players search with one agent each, and the game advances the one state object with makeMove(),
+    as a caller that keeps a single board would.
+    '''
+    random.seed(0)
+    agents = [MCTS(UCB(utilityIdx=[player]), linearExpansion, randomRollout, sumTuple, utilityIdx=[player],
+                   inPlace=inPlace, reuseTree=True, inProcess=True) for player in range(2)]
+    state = MNK(4, 4, 3, ["X", "O"])
+    plies = 0
+    while not state.isTerminal():
+      agent = agents[plies%2]
+      action = agent.search(state, maxIteration=lambda: 200, maxTimeSec=lambda: 10)
+      self.assertIn(action, state.getActions())
+      # The tree must not follow the caller's state
+      self.assertEqual(agent.root.state.moveHistory, state.moveHistory)
+      state.makeMove(action)
+      self.assertNotEqual(agent.root.state, state)
+      plies+=1
+    self.assertGreater(plies, 4)
+
+  def testMakeMove(self):
+    self.playWithMakeMove(False)
+
+  def testMakeMoveInPlace(self):
+    self.playWithMakeMove(True)
+
+class TestNeighborhoodExpansion(unittest.TestCase):
+  def testCallerStateUntouched(self):
+    random.seed(1)
+    state = MNK(9, 9, 5, ["X", "O"])
+    for index in (40, 41): state.makeMove(state.getAction(index))
+    for inPlace in (False, True):
+      with self.subTest(inPlace=inPlace):
+        agent = MCTS(UCB(utilityIdx=[0]), NeighborhoodExpansion(1), randomRollout, sumTuple, utilityIdx=[0],
+                     inPlace=inPlace, inProcess=True)
+        action = agent.search(state, maxIteration=lambda: 300, maxTimeSec=lambda: 10)
+        self.assertIsNone(state.candidateRadius)
+        self.assertIn(action.m*9+action.n, [30, 31, 32, 33, 39, 42, 48, 49, 50, 51])
+        self.assertEqual(set(agent.root.children), set(agent.root.state.getCandidateActions()))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,48 @@
+import random
+import unittest
+from mnk import MNK, BitboardMNK
+from evaluation import utilityMNK
+from minimax import Minimax, MinimaxIDS, KillerHistoryExpansion, NeighborhoodExpansion
+
+'''
+Minimax searches with the expansion policies keeping only the candidate cells.
+Run from the repository root: python -m unittest test_minimax
+'''
+class TestCandidatePolicies(unittest.TestCase):
+  def midGameStates(self)->list:
+    random.seed(2)
+    states = []
+    for stateClass in (MNK, BitboardMNK):
+      random.seed(2)
+      state = stateClass(8, 8, 4, ["X", "O"])
+      for _ in range(5): state.makeMove(random.choice(state.getActions()))
+      states.append(state)
+    return states
+
+  def testCallerStateUntouched(self):
+    for state in self.midGameStates():
+      board = state.getBoard()
+      tracked = state.clone()
+      tracked.trackCandidates(2)
+      for policy in (NeighborhoodExpansion(2), KillerHistoryExpansion(candidateRadius=2)):
+        agents = [Minimax(2, utilityMNK, policy, inPlace=True),
+                  MinimaxIDS(10, 2, utilityMNK, policy, True, cacheSize=1<<12, inPlace=True, inProcess=True)]
+        for agent in agents:
+          with self.subTest(stateClass=state.__class__.__name__, policy=policy.__class__.__name__, agent=agent.__class__.__name__):
+            action = agent.search(state)
+            self.assertIsNone(state.candidateRadius)
+            self.assertEqual(state.getBoard(), board)
+            self.assertIn(action, tracked.getCandidateActions())
+
+  def testSameAsTrackedRoot(self):
+    '''
+    Searching an untracked state gives the move found from a state tracking the candidates already
+    '''
+    for state in self.midGameStates():
+      tracked = state.clone()
+      tracked.trackCandidates(1)
+      actions = [Minimax(2, utilityMNK, NeighborhoodExpansion(1), inPlace=True).search(root) for root in (state, tracked)]
+      self.assertEqual(actions[0], actions[1])
+
+if __name__ == "__main__":
+  unittest.main()
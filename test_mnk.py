@@ -0,0 +1,47 @@
+import random
+import unittest
+from mnk import MNK, BitboardMNK
+
+'''
+The binary encoding of MNK states (toBytes/fromBytes), as sent to workers.SearchWorker.
+Run from the repository root: python -m unittest test_mnk
+'''
+class TestBytes(unittest.TestCase):
+  def randomState(self, rng:random.Random, stateClass:type, numPlayers:int, **kwargs)->MNK:
+    state = stateClass(7, 6, 4, ["p%d" % idx for idx in range(numPlayers)], **kwargs)
+    for _ in range(rng.randrange(20)):
+      if state.isTerminal(): break
+      state.makeMove(rng.choice(state.getActions()))
+    return state
+
+  def testRoundTrip(self):
+    rng = random.Random(0)
+    for stateClass in (MNK, BitboardMNK):
+      for numPlayers in (2, 3, 4, 16, 40):
+        with self.subTest(stateClass=stateClass.__name__, numPlayers=numPlayers):
+          state = self.randomState(rng, stateClass, numPlayers)
+          decoded = stateClass.fromBytes(state.toBytes())
+          self.assertEqual(decoded, state)
+          self.assertEqual(decoded.getBoard(), state.getBoard())
+          self.assertEqual(decoded.getCurrentPlayerSign(), state.getCurrentPlayerSign())
+          self.assertEqual(decoded.lastAction, state.lastAction)
+          self.assertEqual(decoded.isTerminal(), state.isTerminal())
+          self.assertEqual(decoded.getUtility(), state.getUtility())
+
+  def testTrackingIsKept(self):
+    rng = random.Random(1)
+    for stateClass in (MNK, BitboardMNK):
+      for trackThreats, candidateRadius in ((False, None), (True, None), (False, 0), (True, 2)):
+        with self.subTest(stateClass=stateClass.__name__, trackThreats=trackThreats, candidateRadius=candidateRadius):
+          state = self.randomState(rng, stateClass, 2, trackThreats=trackThreats, candidateRadius=candidateRadius)
+          decoded = stateClass.fromBytes(state.toBytes())
+          self.assertEqual(decoded.trackThreats, trackThreats)
+          self.assertEqual(decoded.candidateRadius, candidateRadius)
+          if trackThreats:
+            for sign in state.playerSigns:
+              self.assertEqual(decoded.getThreatCounts(sign), state.getThreatCounts(sign))
+          if candidateRadius is not None:
+            self.assertEqual(decoded.getCandidateActions(), state.getCandidateActions())
+
+if __name__ == "__main__":
+  unittest.main()
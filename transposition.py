@@ -0,0 +1,180 @@
+from typing import Optional, Tuple, Callable, Hashable
+from prototype import State
+import struct
+
+EMPTY, EXACT, LOWER, UPPER = 0, 1, 2, 3  # Bound flags: the value is exact, a lower bound (>= beta), or an upper bound (<= alpha)
+
+def zobristKey(state:State)->int:
+  return state.zobristKey
+
+'''
+A fixed-size transposition table for Minimax, indexed by an int position hash (such as MNK.zobristKey).
+Entries live in parallel arrays laid over one flat buffer rather than in per-entry objects, so the memory used is
+fixed when the table is created: ENTRY_BYTES per slot, two slots per bucket.
+Each entry holds the full key, the bound flag, the value, the draft (the remaining depth the value
+was searched to), the best move found (a flat action index, -1 if none) and its generation.
+A bucket is made of a depth-preferred slot, which keeps the deepest entry,
+and an always-replace slot, which takes any entry the first slot refuses.
+
+The table may be kept from one move to the next: entries are keyed by position and draft, not by ply, so they
+stay valid when the root advances. newSearch() starts a new generation. Entries neither stored nor probed since
+are stale, and the depth-preferred slot gives them up to any new entry, however shallow.
+
+The buffer may be shared between processes (e.g. an anonymous mmap inherited by forked workers, see MinimaxLazySMP).
+Writers do not lock: a shared table stores each key XOR-ed with the rest of its entry, so an entry torn by
+two processes writing at once no longer matches its key and is ignored.
+'''
+class TranspositionTable:
+  ENTRY_BYTES = 8+8+4+2+1+1
+
+  def __init__(self, size:int=1<<20, positionKey:Callable[[State], Hashable]=zobristKey, sharedBuffer=None):
+    '''
+    size: the number of buckets, rounded down to a power of 2
+    positionKey: returns the int key of a state. Expansion policies that probe the table should use it too.
+    sharedBuffer: a writable buffer of at least bufferSize(size) zeroed bytes, shared with other processes.
+                  The table allocates a private buffer if it is None.
+    '''
+    if size<1:
+      raise Exception("The transposition table needs at least one bucket")
+    self.numBuckets = 1<<(size.bit_length()-1)
+    self.mask = self.numBuckets-1
+    self.positionKey = positionKey
+    self.shared = sharedBuffer is not None
+    # The generation of the entries stored or probed by the current search, see newSearch()
+    self.generation = 0
+    numBytes = self.bufferSize(size)
+    if sharedBuffer is None: sharedBuffer = bytearray(numBytes)
+    if len(sharedBuffer)<numBytes:
+      raise Exception("The buffer is too small for %d buckets" % self.numBuckets)
+    self._attach(memoryview(sharedBuffer)[:numBytes])
+
+  @classmethod
+  def bufferSize(cls, size:int)->int:
+    '''
+    Returns the number of bytes used by a table of `size` buckets
+    '''
+    return 2*(1<<(size.bit_length()-1))*cls.ENTRY_BYTES
+
+  def _attach(self, buffer:memoryview)->None:
+    '''
+    Lay the entry fields over `buffer`, largest items first so that every field is aligned
+    '''
+    self.buffer = buffer
+    numSlots = 2*self.numBuckets
+    self.keys = buffer[:8*numSlots].cast('Q')
+    self.values = buffer[8*numSlots:16*numSlots].cast('d')
+    self.valueBits = buffer[8*numSlots:16*numSlots].cast('Q')  # The values seen as ints, to check shared entries
+    self.bestMoves = buffer[16*numSlots:20*numSlots].cast('i')
+    self.drafts = buffer[20*numSlots:22*numSlots].cast('h')
+    self.flags = buffer[22*numSlots:23*numSlots].cast('b')
+    # Left out of the key check of a shared table: a torn generation only changes which entry is replaced first
+    self.generations = buffer[23*numSlots:24*numSlots].cast('B')
+
+  @staticmethod
+  def _meta(flag:int, draft:int, bestMove:int)->int:
+    return flag | (draft&0xFFFF)<<8 | (bestMove&0xFFFFFFFF)<<24
+
+  def _storedKey(self, slot:int)->int:
+    '''
+    Returns the key of the entry in `slot`
+    '''
+    if not self.shared: return self.keys[slot]
+    return self.keys[slot]^self.valueBits[slot]^self._meta(self.flags[slot], self.drafts[slot], self.bestMoves[slot])
+
+  def probe(self, key:int)->Optional[Tuple[int, float, int, int]]:
+    '''
+    Returns (flag, value, draft, bestMove) stored for `key`, or None.
+    The entry found joins the current generation.
+    '''
+    slot = (key&self.mask)<<1
+    for slot in (slot, slot+1):
+      flag = self.flags[slot]
+      if not flag: continue
+      if not self.shared:
+        if self.keys[slot]==key:
+          self.generations[slot] = self.generation
+          return flag, self.values[slot], self.drafts[slot], self.bestMoves[slot]
+        continue
+      # Read each field once, then check that they all come from the same write
+      storedKey, valueBits, draft, bestMove = self.keys[slot], self.valueBits[slot], self.drafts[slot], self.bestMoves[slot]
+      if storedKey^valueBits^self._meta(flag, draft, bestMove)==key:
+        self.generations[slot] = self.generation
+        # Decode the verified bits: self.values[slot] may have been rewritten since they were read
+        return flag, struct.unpack('d', struct.pack('Q', valueBits))[0], draft, bestMove
+    return None
+
+  def store(self, key:int, flag:int, value:float, draft:int, bestMove:int=-1)->None:
+    '''
+    Store an entry. It goes to the depth-preferred slot of its bucket if that slot is empty,
+    already holds `key`, holds a stale entry, or holds an entry searched no deeper than `draft`;
+    the entry it replaces then moves to the always-replace slot, unless it is stale.
+    Otherwise it goes to the always-replace slot.
+    '''
+    slot = (key&self.mask)<<1
+    flags = self.flags
+    slotKey = self._storedKey(slot) if flags[slot]!=EMPTY else None
+    stale = slotKey is not None and self.generations[slot]!=self.generation
+    if slotKey is None or slotKey==key or stale or draft>=self.drafts[slot]:
+      if slotKey is not None and slotKey!=key and not stale:
+        self._write(slot+1, slotKey, flags[slot], self.values[slot], self.drafts[slot], self.bestMoves[slot])
+      elif flags[slot+1]!=EMPTY and self._storedKey(slot+1)==key:
+        flags[slot+1] = EMPTY
+    else:
+      slot+=1
+    self._write(slot, key, flag, value, draft, bestMove)
+
+  def _write(self, slot:int, key:int, flag:int, value:float, draft:int, bestMove:int)->None:
+    self.flags[slot] = flag
+    self.values[slot] = value
+    self.drafts[slot] = draft
+    self.bestMoves[slot] = bestMove
+    self.generations[slot] = self.generation
+    if self.shared: key ^= self.valueBits[slot]^self._meta(flag, draft, bestMove)
+    self.keys[slot] = key
+
+  def newSearch(self)->None:
+    '''
+    Start a new generation: the entries of the previous searches are kept, but replaced first.
+    Call it before searching a new root, e.g. the next move of a game.
+    '''
+    self.generation = (self.generation+1)&0xFF
+
+  def bestMove(self, key:int)->int:
+    '''
+    Returns the best move stored for `key` whatever its draft, -1 if there is none.
+    '''
+    entry = self.probe(key)
+    return entry[3] if entry else -1
+
+  def cachedValue(self, state:State, depth:int)->float:
+    '''
+    Returns the value stored for a state whatever its draft and bound, 0 if there is none.
+    Used to order moves, see minimax.cacheExpansion.
+    '''
+    entry = self.probe(self.positionKey(state))
+    return entry[1] if entry else 0
+
+  def clear(self)->None:
+    '''
+    Empty every slot, in place so that a shared table is emptied for every process
+    '''
+    numSlots = 2*self.numBuckets
+    self.buffer[22*numSlots:23*numSlots] = bytes(numSlots)
+
+  def usedSlots(self)->int:
+    '''
+    Returns the number of slots in use
+    '''
+    return len(self.flags)-self.flags.tobytes().count(EMPTY)
+
+  def __getstate__(self)->dict:
+    # memoryviews cannot be pickled: a pickled table carries a private copy of its entries
+    state = self.__dict__.copy()
+    for name in ("buffer", "keys", "values", "valueBits", "bestMoves", "drafts", "flags", "generations"): del state[name]
+    state["data"] = self.buffer.tobytes()
+    return state
+
+  def __setstate__(self, state:dict)->None:
+    data = bytearray(state.pop("data"))
+    self.__dict__.update(state)
+    self._attach(memoryview(data))
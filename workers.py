@@ -0,0 +1,100 @@
+from prototype import Search, State, Action
+from mnk import MNK
+from multiprocessing import Process, Pipe
+import time
+
+'''
+A search agent kept alive in its own process between moves.
+MinimaxIDS.search and MCTS.search start a Manager server and a new Process on every move, and
+whatever the child process learned (the cache, the tree) is lost when it is killed.
+A SearchWorker starts one process when it is created, and for every move sends it the position
+encoded with state.toBytes() through a Pipe, with the time the move is due. The agent in the worker process
+searches with agent.searchUntil() until then, sends back its best action as it goes (every completed
+iteration of a MinimaxIDS, every MCTS.searchUntil `reportInterval`), and stops by itself
+(see Minimax `deadline`), so its cache and tree are ready for the next move.
+
+It is used in place of the agent, e.g. in utils.gamePlay:
+  agent = SearchWorker(MinimaxIDS(time=3, maxDepth=15, ...))
+  action = agent.search(state)
+  agent.close()
+The agent object kept by the caller is a copy, it does not see what the worker learns.
+'''
+class SearchWorker(Search):
+  def __init__(self, agent:Search, stateClass:type=MNK):
+    '''
+    agent: a MinimaxIDS or MCTS, or any Search with workerRequest() and searchUntil() methods.
+    stateClass: the class of the searched states. It decodes the positions with stateClass.fromBytes().
+    '''
+    self.agent = agent
+    self.connection, workerConnection = Pipe()
+    self.process = Process(target=serveSearches, args=(agent, stateClass, workerConnection), daemon=True)
+    self.process.start()
+    workerConnection.close()
+    # Whether the worker is still searching the previous position
+    self.busy = False
+
+  def search(self, state:State, **kwargs)->Action:
+    '''
+    Search `state` with the agent in the worker process.
+    kwargs are the arguments of agent.search(), see agent.workerRequest().
+    Returns the action of the last iteration completed by the time limit,
+    or the first action of state.getActions() if none completed.
+    '''
+    timeLimit, searchKwargs = self.agent.workerRequest(**kwargs)
+    endTime = time.time()+timeLimit
+    self.wait()
+    # The worker stops at the same endTime, rather than timeLimit after it has decoded the position
+    self.connection.send((state.toBytes(), endTime, searchKwargs))
+    self.busy = True
+    action = None
+    while self.connection.poll(max(0, endTime-time.time())):
+      message = self.connection.recv()
+      if message is None:
+        self.busy = False
+        break
+      action = message
+    if action is None:
+      action = state.getActions()[0]
+      print("Fail to search for an action - return the first possible action found.")
+    return action
+
+  def wait(self)->None:
+    '''
+    Wait until the worker is done with the previous position, dropping the actions it still sends
+    '''
+    while self.busy:
+      if self.connection.recv() is None: self.busy = False
+
+  def close(self)->None:
+    '''
+    Stop the worker process
+    '''
+    if self.process.is_alive():
+      self.wait()
+      self.connection.send(None)
+      self.process.join()
+    self.connection.close()
+
+class _ConnectionQueue:
+  '''
+  The put() of a Queue, sending every item through a Connection
+  '''
+  def __init__(self, connection):
+    self.connection = connection
+
+  def put(self, item)->None:
+    self.connection.send(item)
+
+def serveSearches(agent:Search, stateClass:type, connection)->None:
+  '''
+  The loop of a worker process: for every (encoded state, end time, kwargs) received, search the state
+  with agent.searchUntil() until the end time, send every action reported, then None. Stops when it receives None.
+  '''
+  queueOfActions = _ConnectionQueue(connection)
+  while True:
+    request = connection.recv()
+    if request is None: break
+    data, endTime, kwargs = request
+    agent.searchUntil(stateClass.fromBytes(data), endTime, queueOfActions, **kwargs)
+    connection.send(None)
+  connection.close()